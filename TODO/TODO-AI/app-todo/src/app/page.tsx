@@ -28,28 +28,40 @@ interface ApiResponse {
 }
 
 interface TodosResponse {
-  todos: Todo[]
-  count: number
+  data: {
+    items: Todo[]
+    size: number
+    next_cursor: string | null
+    total: number | null
+  }
 }
 
+// A local API without the Caddy proxy: it has to run with DEFAULT_USER_ID,
+// since no X-User-Id or credentials are sent (see the backend README)
+const TODOS_URL = "http://localhost:8080/api/v1/todo/todos"
+const TODOS_PAGE_SIZE = 100
+
 export default function TodoAIAgent() {
   const [todos, setTodos] = useState<Todo[]>([])
   const [todoCount, setTodoCount] = useState(0)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [isLoadingMore, setIsLoadingMore] = useState(false)
   const [chatMessages, setChatMessages] = useState<ChatMessage[]>([])
   const [inputValue, setInputValue] = useState("")
   const [isLoading, setIsLoading] = useState(false)
   const [isLoadingTodos, setIsLoadingTodos] = useState(true)
   const chatEndRef = useRef<HTMLDivElement>(null)
 
-  // Fetch todos from API
+  // Fetch the first page of todos from API
   const fetchTodos = async () => {
     try {
       setIsLoadingTodos(true)
-      const response = await fetch("http://localhost:8080/api/v1/todo/todos")
+      const response = await fetch(`${TODOS_URL}?size=${TODOS_PAGE_SIZE}&include_total=true`)
       if (response.ok) {
         const data: TodosResponse = await response.json()
-        setTodos(data.todos)
-        setTodoCount(data.count)
+        setTodos(data.data.items)
+        setNextCursor(data.data.next_cursor)
+        setTodoCount(data.data.total ?? data.data.items.length)
       }
     } catch (error) {
       console.error("Failed to fetch todos:", error)
@@ -58,6 +70,25 @@ export default function TodoAIAgent() {
     }
   }
 
+  // Follow next_cursor to append the next page
+  const fetchMoreTodos = async () => {
+    if (!nextCursor) return
+    try {
+      setIsLoadingMore(true)
+      const params = new URLSearchParams({ size: String(TODOS_PAGE_SIZE), cursor: nextCursor })
+      const response = await fetch(`${TODOS_URL}?${params}`)
+      if (response.ok) {
+        const data: TodosResponse = await response.json()
+        setTodos((prev) => [...prev, ...data.data.items])
+        setNextCursor(data.data.next_cursor)
+      }
+    } catch (error) {
+      console.error("Failed to fetch more todos:", error)
+    } finally {
+      setIsLoadingMore(false)
+    }
+  }
+
   // Send message to AI agent
   const sendMessage = async (userInput: string) => {
     if (!userInput.trim()) return
@@ -193,6 +224,16 @@ export default function TodoAIAgent() {
                         </Badge>
                       </div>
                     ))}
+                    {nextCursor && (
+                      <Button
+                        variant="outline"
+                        className="w-full"
+                        onClick={fetchMoreTodos}
+                        disabled={isLoadingMore}
+                      >
+                        {isLoadingMore ? "Loading..." : `Show more (${todos.length} of ${todoCount})`}
+                      </Button>
+                    )}
                   </div>
                 )}
               </ScrollArea>
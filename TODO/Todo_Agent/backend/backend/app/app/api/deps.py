@@ -0,0 +1,23 @@
+from fastapi import HTTPException, Request
+
+from app.core.config import settings
+
+
+USER_ID_MAX_LENGTH = 64  # Todos.user_id column size
+
+
+def get_user_id(request: Request) -> str:
+    """
+    Caller's user id from the USER_ID_HEADER set by the auth proxy, which
+    overwrites any value sent by the client. DEFAULT_USER_ID (unset by
+    default) only serves single-user setups without the proxy.
+    """
+    user_id = request.headers.get(settings.USER_ID_HEADER, "").strip() or settings.DEFAULT_USER_ID
+    if not user_id:
+        raise HTTPException(status_code=401, detail=f"Missing {settings.USER_ID_HEADER} header")
+    if len(user_id) > USER_ID_MAX_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{settings.USER_ID_HEADER} must be at most {USER_ID_MAX_LENGTH} characters",
+        )
+    return user_id
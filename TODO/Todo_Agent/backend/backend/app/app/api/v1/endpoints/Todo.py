@@ -1,11 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List, Literal
+import asyncio
+import csv
+import io
+import json
+from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 import traceback
-from app.schemas.todo import TodoRequest, TodoResponse
-from app.services.tools_service import process_todo_request
+from app.api.deps import get_user_id
+from app.schemas.todo import (
+    TodoRead,
+    TodoRequest,
+    TodoResponse,
+    TodoBulkCreateRequest,
+    TodoBulkCreateResult,
+    TodoBulkDeleteRequest,
+    TodoBulkDeleteResult,
+    TodoJob,
+)
+from app.schemas.response_schema import (
+    CursorPageBase,
+    IDeleteResponseBase,
+    IGetResponseBase,
+    IPostResponseBase,
+    create_response,
+)
+from app.utils.cursor import decode_cursor, encode_cursor
+from app.core.config import settings
+from app.services.tools_service import process_todo_request, run_todo_request
 from app.models.todo import Todos
-from app.db.session import get_db
+from app.db.session import AsyncSessionLocal, get_async_db
+from app.helpers import cache_helper as cacheh
+from app.helpers.ai_helper import TokenUsage
+from app.services import admission_service, job_service
 
 
 # Configure logging
@@ -15,34 +43,283 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # API Endpoints
-@router.post("/todo", response_model=TodoResponse)
-async def process_todo(request: TodoRequest, db: Session = Depends(get_db)):
-    """Process todo request via API."""
+@router.post(
+    "/todo",
+    response_model=TodoResponse,
+    dependencies=[Depends(admission_service.rate_limit)],
+)
+async def process_todo(
+    request: TodoRequest,
+    db: AsyncSession = Depends(get_async_db),
+    user_id: str = Depends(get_user_id),
+):
+    """Process the caller's todo request via API."""
     try:
         if not request.user_input.strip():
             raise HTTPException(status_code=400, detail="User input cannot be empty")
         
-        result = process_todo_request(request.user_input, db)
+        usage = TokenUsage()
+        # Answer before the gunicorn worker timeout instead of being killed by it
+        result = await asyncio.wait_for(
+            process_todo_request(request.user_input, db, user_id, usage),
+            settings.AGENT_REQUEST_TIMEOUT_SECONDS,
+        )
+        logger.info(f"Token usage: {usage.to_dict()}")
         
         return TodoResponse(
             message=result,
-            success=True
+            success=True,
+            usage=usage.to_dict()
         )
         
+    except HTTPException:
+        raise
+    except admission_service.OverloadedError as e:
+        raise admission_service.overloaded_response(e)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Request took longer than {settings.AGENT_REQUEST_TIMEOUT_SECONDS} seconds",
+        )
     except Exception as e:
         logger.error(f"API error: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _stream_todo_request(user_input: str, user_id: str) -> AsyncIterator[str]:
+    """Encode agent events as server-sent events, closing with the token usage."""
+    usage = TokenUsage()
+    # The response outlives the request dependencies, so the stream owns its session
+    async with AsyncSessionLocal() as db:
+        try:
+            async for event in run_todo_request(user_input, db, user_id, usage, stream_output=True):
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+        except admission_service.OverloadedError as e:
+            # The 200 is already sent, so the shed request ends with an error event
+            data = {"message": "The assistant is at capacity, retry later", "retry_after": e.retry_after}
+            yield f"event: error\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            logger.error(f"Streaming API error: {e}")
+            yield f"event: error\ndata: {json.dumps({'message': str(e)})}\n\n"
+    logger.info(f"Token usage: {usage.to_dict()}")
+    yield f"event: done\ndata: {json.dumps({'usage': usage.to_dict()})}\n\n"
+
+@router.post("/todo/stream", dependencies=[Depends(admission_service.rate_limit)])
+async def process_todo_stream(request: TodoRequest, user_id: str = Depends(get_user_id)):
+    """Process todo request, streaming steps, tool results and the answer as server-sent events."""
+    if not request.user_input.strip():
+        raise HTTPException(status_code=400, detail="User input cannot be empty")
+    return StreamingResponse(
+        _stream_todo_request(request.user_input, user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _job_read(job: dict) -> TodoJob:
+    return TodoJob(
+        id=job["id"],
+        status=job["status"],
+        message=job["message"],
+        error=job["error"],
+        usage=job["usage"],
+    )
+
+@router.post("/jobs", status_code=202, dependencies=[Depends(admission_service.rate_limit)])
+async def submit_todo_job(
+    request: TodoRequest,
+    broker=Depends(job_service.get_job_broker),
+    user_id: str = Depends(get_user_id),
+) -> IPostResponseBase[TodoJob]:
+    """Queue a todo request for the worker pool and return its job id right away."""
+    if not request.user_input.strip():
+        raise HTTPException(status_code=400, detail="User input cannot be empty")
+    job = job_service.new_job(request.user_input, user_id)
+    try:
+        await broker.enqueue(job)
+    except job_service.QueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="Job queue is full, retry later",
+            headers={"Retry-After": str(settings.JOB_RETRY_AFTER_SECONDS)},
+        )
+    return create_response(data=_job_read(job), message="Job queued")
+
+async def _get_own_job(job_id: str, broker, user_id: str) -> dict:
+    """The caller's job; other users' jobs are reported as missing."""
+    job = await broker.get(job_id)
+    if job is None or job.get("user_id") != user_id:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@router.get("/jobs/{job_id}")
+async def get_todo_job(
+    job_id: str,
+    broker=Depends(job_service.get_job_broker),
+    user_id: str = Depends(get_user_id),
+) -> IGetResponseBase[TodoJob]:
+    """Poll a queued todo request."""
+    job = await _get_own_job(job_id, broker, user_id)
+    return create_response(data=_job_read(job), message=f"Job {job['status']}")
+
+async def _follow_job(job_id: str, broker) -> AsyncIterator[str]:
+    """Replay the job's events, then send new ones until it finishes."""
+    sent = 0
+    while True:
+        job = await broker.get(job_id)
+        if job is None:
+            return
+        new_events = job["events"][sent:]
+        for event in new_events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+        sent += len(new_events)
+        if job["status"] in job_service.FINISHED_STATUSES:
+            yield f"event: done\ndata: {_job_read(job).model_dump_json()}\n\n"
+            return
+        # Only sleep when nothing changed since the read above
+        if not new_events:
+            await broker.wait_for_change(job_id, timeout=15)
+
+@router.get("/jobs/{job_id}/events")
+async def follow_todo_job(
+    job_id: str,
+    broker=Depends(job_service.get_job_broker),
+    user_id: str = Depends(get_user_id),
+):
+    """Subscribe to a job's agent events as server-sent events."""
+    await _get_own_job(job_id, broker, user_id)
+    return StreamingResponse(
+        _follow_job(job_id, broker),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/todos")
-async def get_todos(db: Session = Depends(get_db)):
-    """Get all todos."""
+async def get_todos(
+    size: int = Query(settings.TODO_PAGE_DEFAULT_SIZE, ge=1, le=settings.TODO_PAGE_MAX_SIZE),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
+    include_total: bool = Query(False, description="Also count all todos (extra query)"),
+    db: AsyncSession = Depends(get_async_db),
+    user_id: str = Depends(get_user_id),
+) -> IGetResponseBase[CursorPageBase[TodoRead]]:
+    """Get a page of the caller's todos ordered by creation time (keyset pagination)."""
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
-        todos = Todos.get_all_todos(db)
-        return {
-            "todos": [{"id": todo.id, "task": todo.todo_task} for todo in todos],
-            "count": len(todos)
-        }
+        # One extra row tells whether another page exists
+        todos = await Todos.get_todos_page(db, user_id, size + 1, after)
+        next_cursor = None
+        if len(todos) > size:
+            todos = todos[:size]
+            next_cursor = encode_cursor(todos[-1].created_at, todos[-1].id)
+        total = await Todos.count_todos(db, user_id) if include_total else None
+        page = CursorPageBase[TodoRead](
+            items=[TodoRead(id=todo.id, task=todo.todo_task) for todo in todos],
+            size=size,
+            next_cursor=next_cursor,
+            total=total,
+        )
+        return create_response(data=page, message="Todos got correctly")
     except Exception as e:
         logger.error(f"Error getting todos: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+EXPORT_COLUMNS = ("id", "task", "created_at", "updated_at")
+
+def _export_record(row) -> tuple:
+    return (
+        row.id,
+        row.todo_task,
+        row.created_at.isoformat() if row.created_at else None,
+        row.updated_at.isoformat() if row.updated_at else None,
+    )
+
+def _csv_chunk(records) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(records)
+    return buffer.getvalue()
+
+async def _export_todos(format: str, user_id: str) -> AsyncIterator[str]:
+    """Encode todos chunk by chunk as they arrive from the server-side cursor."""
+    if format == "csv":
+        yield _csv_chunk([EXPORT_COLUMNS])
+    # The response outlives the request dependencies, so the stream owns its session
+    async with AsyncSessionLocal() as db:
+        async for rows in Todos.stream_todos(db, user_id, settings.TODO_EXPORT_CHUNK_SIZE):
+            records = [_export_record(row) for row in rows]
+            if format == "csv":
+                yield _csv_chunk(records)
+            else:
+                yield "".join(
+                    json.dumps(dict(zip(EXPORT_COLUMNS, record, strict=True))) + "\n" for record in records
+                )
+
+@router.get("/todos/export")
+async def export_todos(
+    format: Literal["ndjson", "csv"] = "ndjson", user_id: str = Depends(get_user_id)
+):
+    """Stream every todo of the caller as NDJSON or CSV with constant memory."""
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _export_todos(format, user_id),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="todos.{format}"'},
+    )
+
+@router.post("/todos/bulk")
+async def bulk_create_todos(
+    request: TodoBulkCreateRequest,
+    db: AsyncSession = Depends(get_async_db),
+    user_id: str = Depends(get_user_id),
+) -> IPostResponseBase[List[TodoBulkCreateResult]]:
+    """Create many todos with one multi-row insert and a single commit."""
+    if len(request.tasks) > settings.TODO_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.TODO_BULK_MAX_ITEMS} todos can be created per request",
+        )
+    try:
+        valid = [(index, task.strip()) for index, task in enumerate(request.tasks) if task.strip()]
+        rows = await Todos.bulk_create_todos(db, user_id, [task for _, task in valid])
+        created = {index: row for (index, _), row in zip(valid, rows, strict=True)}
+        results = [
+            TodoBulkCreateResult(index=index, created=True, id=created[index][0], task=created[index][1])
+            if index in created
+            else TodoBulkCreateResult(index=index, created=False, task=task, error="Task cannot be empty")
+            for index, task in enumerate(request.tasks)
+        ]
+        return create_response(
+            data=results, message=f"Created {len(rows)} of {len(request.tasks)} todos"
+        )
+    except Exception as e:
+        logger.error(f"Error bulk creating todos: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/todos/bulk")
+async def bulk_delete_todos(
+    request: TodoBulkDeleteRequest,
+    db: AsyncSession = Depends(get_async_db),
+    user_id: str = Depends(get_user_id),
+) -> IDeleteResponseBase[List[TodoBulkDeleteResult]]:
+    """Delete many todos by ID with one set-based delete and a single commit."""
+    if len(request.ids) > settings.TODO_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.TODO_BULK_MAX_ITEMS} todos can be deleted per request",
+        )
+    try:
+        task_ids = list(dict.fromkeys(request.ids))
+        deleted = await Todos.bulk_delete_todos_by_id(db, user_id, task_ids)
+        results = [TodoBulkDeleteResult(id=task_id, deleted=task_id in deleted) for task_id in task_ids]
+        return create_response(
+            data=results, message=f"Deleted {len(deleted)} of {len(task_ids)} todos"
+        )
+    except Exception as e:
+        logger.error(f"Error bulk deleting todos: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Get LLM response cache counters for this worker."""
+    return cacheh.cache_stats()
\ No newline at end of file
@@ -1,73 +1,99 @@
-from typing import Annotated
-from fastapi import APIRouter, Query
-from asyncer import asyncify, create_task_group, syncify
+from typing import Annotated, AsyncIterator, Literal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from asyncer import asyncify, syncify
+import asyncio
+import json
 from app.core.config import settings
 import httpx
 from app.schemas.response_schema import IGetResponseBase, create_response
+from app.helpers import weather_cache_helper as weathercacheh
+from app.helpers import metrics_helper as metricsh
+from app.services.http_service import get_http_client, get_sync_http_client
 
 router = APIRouter()
 
 api_reference: dict[str, str] = {"api_reference": "https://github.com/chubin/wttr.in"}
 
 
-def get_weather_sync(city: str):
+def get_weather_sync(city: str, client: httpx.Client):
     """
     Gets weather by goweather API with sync client
     """
-    response = httpx.get(f"{settings.WHEATER_URL}/{city}?format=j1")
+    with metricsh.WEATHER_UPSTREAM_DURATION.labels(client="sync").time():
+        response = client.get(f"{settings.WHEATER_URL}/{city}?format=j1")
+    response.raise_for_status()
     weather = response.json()
     weather["city"] = city
     return weather
 
 
-async def get_weather_async(city: str):
+async def fetch_weather_async(city: str, client: httpx.AsyncClient):
     """
     Gets weather by goweather API with async client
     """
-    async with httpx.AsyncClient() as client:
+    with metricsh.WEATHER_UPSTREAM_DURATION.labels(client="async").time():
         response = await client.get(f"{settings.WHEATER_URL}/{city}?format=j1")
-        weather = response.json()
-        weather["city"] = city
-        return weather
+    response.raise_for_status()
+    weather = response.json()
+    weather["city"] = city
+    return weather
+
+
+async def get_weather_async(city: str, client: httpx.AsyncClient):
+    """
+    Gets weather by city through the weather cache
+    """
+    return await weathercacheh.get_weather(
+        city, lambda: fetch_weather_async(city=city, client=client)
+    )
 
 
-def do_sync_work(city: str):
+def do_sync_work(city: str, client: httpx.AsyncClient):
     """
     Gets weather by sync work
     """
     # This similar aproach will be used to interface with celery
-    weather = syncify(get_weather_async)(city=city)
+    weather = syncify(get_weather_async)(city=city, client=client)
     return weather
 
 
 @router.get("/weather_sync/sync1")
-async def get_weather_sync_work_by_city(city: str = "Quito") -> IGetResponseBase:
+async def get_weather_sync_work_by_city(
+    city: str = "Quito", client: httpx.AsyncClient = Depends(get_http_client)
+) -> IGetResponseBase:
     """
     Gets Weather by city using sync work
     """
-    weather = await asyncify(do_sync_work)(city=city)
+    weather = await asyncify(do_sync_work)(city=city, client=client)
     return create_response(
         message=f"Weather in {city}", data=weather, meta=api_reference
     )
 
 
 @router.get("/weather_sync/sync2")
-async def get_weather_sync_client_by_city(city: str = "Quito") -> IGetResponseBase:
+async def get_weather_sync_client_by_city(
+    city: str = "Quito", client: httpx.Client = Depends(get_sync_http_client)
+) -> IGetResponseBase:
     """
     Gets Weather by city using sync client
     """
-    weather = await asyncify(get_weather_sync)(city=city)
+    weather = await weathercacheh.get_weather(
+        city, lambda: asyncify(get_weather_sync)(city=city, client=client)
+    )
     return create_response(
         message=f"Weather in {city}", data=weather, meta=api_reference
     )
 
 
 @router.get("/weather_async")
-async def get_weather_async_client_by_city(city: str = "Quito") -> IGetResponseBase:
+async def get_weather_async_client_by_city(
+    city: str = "Quito", client: httpx.AsyncClient = Depends(get_http_client)
+) -> IGetResponseBase:
     """
     Gets Weather by city using async client
     """
-    weather = await get_weather_async(city=city)
+    weather = await get_weather_async(city=city, client=client)
     return create_response(
         message=f"Weather in {city}", data=weather, meta=api_reference
     )
@@ -80,6 +106,7 @@ async def get_weather_async_sequencial_by_cities(
         "Miami",
         "Barcelona",
     ],
+    client: httpx.AsyncClient = Depends(get_http_client),
 ) -> IGetResponseBase:
     """
     Gets Weather by list of cities
@@ -87,7 +114,7 @@ async def get_weather_async_sequencial_by_cities(
     """
     weather_list = []
     for city in cities:
-        weather = await get_weather_async(city=city)
+        weather = await get_weather_async(city=city, client=client)
         weather_list.append(weather)
 
     return create_response(
@@ -95,6 +122,69 @@ async def get_weather_async_sequencial_by_cities(
     )
 
 
+async def _fetch_city(
+    index: int,
+    city: str,
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    deadline: float,
+) -> dict:
+    """
+    Weather result of one city in a fan-out; failures are reported, not raised
+    """
+    async def limited():
+        async with semaphore:
+            return await asyncio.wait_for(
+                get_weather_async(city=city, client=client),
+                settings.WEATHER_CITY_TIMEOUT_SECONDS,
+            )
+
+    remaining = deadline - asyncio.get_running_loop().time()
+    try:
+        weather = await asyncio.wait_for(limited(), max(remaining, 0))
+        return {"index": index, "city": city, "weather": weather}
+    except asyncio.TimeoutError:
+        return {"index": index, "city": city, "error": "timed out"}
+    except Exception as e:
+        error = str(e).splitlines()[0] if str(e) else type(e).__name__
+        return {"index": index, "city": city, "error": error}
+
+
+async def _fan_out(cities: list[str], client: httpx.AsyncClient) -> AsyncIterator[dict]:
+    """
+    Yields one result per city as soon as it arrives, with at most
+    WEATHER_FANOUT_CONCURRENCY upstream calls in flight and every city
+    finished by the overall deadline
+    """
+    semaphore = asyncio.Semaphore(settings.WEATHER_FANOUT_CONCURRENCY)
+    deadline = asyncio.get_running_loop().time() + settings.WEATHER_FANOUT_DEADLINE_SECONDS
+    tasks = [
+        asyncio.ensure_future(_fetch_city(index, city, client, semaphore, deadline))
+        for index, city in enumerate(cities)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The client may have gone away in the middle of a stream
+        for task in tasks:
+            task.cancel()
+
+
+async def _stream_fan_out(cities: list[str], client: httpx.AsyncClient, format: str) -> AsyncIterator[str]:
+    errors = 0
+    async for result in _fan_out(cities, client):
+        errors += "error" in result
+        if format == "sse":
+            event = "error" if "error" in result else "weather"
+            yield f"event: {event}\ndata: {json.dumps(result)}\n\n"
+        else:
+            yield json.dumps(result) + "\n"
+    if format == "sse":
+        summary = {"cities": len(cities), "errors": errors}
+        yield f"event: done\ndata: {json.dumps(summary)}\n\n"
+
+
 @router.get("/weather_async_list/concurrent")
 async def get_weather_async_concurrent_by_cities(
     cities: Annotated[list[str], Query(title="Cities")] = [
@@ -102,17 +192,41 @@ async def get_weather_async_concurrent_by_cities(
         "Miami",
         "Barcelona",
     ],
+    format: Literal["json", "ndjson", "sse"] = "json",
+    client: httpx.AsyncClient = Depends(get_http_client),
 ) -> IGetResponseBase:
     """
     Gets Weather by list of cities
     It it optimized to do concurrent requests (It is faster than sequencial endpoint)
-    """
-    weather_list = [{}] * len(cities)
-    async with create_task_group() as task_group:
-        for index, city in enumerate(cities):
-            weather_list[index] = task_group.soonify(get_weather_async)(city=city)
-
-    weather_list = [weather.value for weather in weather_list]
+    Cities that fail or miss the deadline are listed in meta.errors; with
+    format=ndjson or format=sse each city is streamed as soon as it arrives
+    """
+    if len(cities) > settings.WEATHER_FANOUT_MAX_CITIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.WEATHER_FANOUT_MAX_CITIES} cities per request",
+        )
+    if format != "json":
+        media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+        return StreamingResponse(
+            _stream_fan_out(cities, client, format),
+            media_type=media_type,
+            headers={"Cache-Control": "no-cache"},
+        )
+
+    results = sorted([result async for result in _fan_out(cities, client)], key=lambda r: r["index"])
+    weather_list = [result["weather"] for result in results if "weather" in result]
+    errors = [
+        {"city": result["city"], "error": result["error"]} for result in results if "error" in result
+    ]
     return create_response(
-        message=f"Weather in {', '.join(cities)}", data=weather_list, meta=api_reference
+        message=f"Weather in {', '.join(cities)}",
+        data=weather_list,
+        meta={**api_reference, "errors": errors},
     )
+
+
+@router.get("/cache/stats")
+async def get_weather_cache_stats():
+    """Get weather cache counters for this worker."""
+    return weathercacheh.cache_stats()
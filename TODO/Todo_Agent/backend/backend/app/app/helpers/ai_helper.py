@@ -1,26 +1,164 @@
 
-import google.generativeai as genai
 from app.helpers import data_helper as datah
+from app.helpers import cache_helper as cacheh
+from app.helpers import prompt_helper as prompth
+from app.helpers import metrics_helper as metricsh
+from app.services import llm_service
+from app.services import admission_service
+from app.schemas.agent import GEMINI_RESPONSE_SCHEMA
+from app.core.config import settings
+from dataclasses import asdict, dataclass
+import hashlib
+import json
 import logging
-from typing import Dict
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Identifies the system instruction and response schema in cache keys, so
+# editing either never serves responses produced under the old ones.
+SYSTEM_PROMPT_VERSION = hashlib.sha256(
+    (prompth.SYSTEM_PROMPT + json.dumps(GEMINI_RESPONSE_SCHEMA, sort_keys=True)).encode("utf-8")
+).hexdigest()[:12]
+
+
+@dataclass
+class TokenUsage:
+    """Token accounting for all LLM calls made while serving one request."""
+
+    llm_calls: int = 0
+    cache_hits: int = 0
+    input_tokens: int = 0
+    cached_input_tokens: int = 0
+    output_tokens: int = 0
+
+    def add(self, usage_metadata: Any) -> None:
+        self.llm_calls += 1
+        if usage_metadata is None:
+            return
+        self.input_tokens += getattr(usage_metadata, "prompt_token_count", 0) or 0
+        self.cached_input_tokens += getattr(usage_metadata, "cached_content_token_count", 0) or 0
+        self.output_tokens += getattr(usage_metadata, "candidates_token_count", 0) or 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
 
-GEMINI_API_KEY = ""
-genai.configure(api_key=GEMINI_API_KEY)
 
 # Pure functions for LLM operations
-def create_gemini_client() -> genai.GenerativeModel:
-    """Create and return a Gemini client."""
-    return genai.GenerativeModel(model_name="gemini-1.5-flash")
+def get_llm_provider() -> llm_service.LLMProvider:
+    """The worker's model backend selected by LLM_PROVIDER."""
+    return llm_service.get_provider()
+
+async def _lookup_cache(
+    prompt: str | List[Dict],
+    client: llm_service.LLMProvider,
+    user_id: str,
+    usage: Optional[TokenUsage],
+) -> Tuple[Optional[str], Optional[Dict]]:
+    """Cache key for the call (None when caching is off) and the cached response if any."""
+    if not settings.LLM_CACHE_ENABLED:
+        return None, None
+    namespace = f"{client.name}:{SYSTEM_PROMPT_VERSION}"
+    cache_key = await cacheh.build_cache_key(prompt, user_id, namespace)
+    if cache_key is None:
+        return None, None
+    cached = await cacheh.get_cached_response(cache_key)
+    if cached is not None:
+        metricsh.LLM_CACHE_HITS.inc()
+        if usage is not None:
+            usage.cache_hits += 1
+    return cache_key, cached
 
-def call_llm(prompt: str, client: genai.GenerativeModel) -> Dict:
-    """Call LLM with given prompt."""
+async def call_llm(
+    prompt: str | List[Dict],
+    client: llm_service.LLMProvider,
+    user_id: str,
+    usage: Optional[TokenUsage] = None,
+    admitted: bool = False,
+) -> Dict:
+    """
+    Call LLM with a prompt or conversation of user_id without blocking the
+    event loop. Responses are cached per user. Raises admission_service.OverloadedError when a not yet admitted request
+    finds no LLM capacity.
+    """
+    cache_key, cached = await _lookup_cache(prompt, client, user_id, usage)
+    if cached is not None:
+        return cached
+    async with admission_service.get_llm_limiter().slot(admitted):
+        return await _call_llm(prompt, client, usage, cache_key)
+
+async def _call_llm(
+    prompt: str | List[Dict],
+    client: llm_service.LLMProvider,
+    usage: Optional[TokenUsage],
+    cache_key: Optional[str],
+) -> Dict:
+    start = time.perf_counter()
     try:
-        response = client.generate_content(prompt)
-        return datah.parse_llm_response(response.text)
+        response = await client.generate(prompt)
+        metricsh.LLM_CALL_DURATION.labels(mode="call", outcome="ok").observe(time.perf_counter() - start)
+        if usage is not None:
+            usage.add(response.usage_metadata)
+        parsed = datah.parse_llm_response(response.text)
     except Exception as e:
+        metricsh.LLM_CALL_DURATION.labels(mode="call", outcome="error").observe(time.perf_counter() - start)
         logger.error(f"Error calling LLM: {e}")
         return {"error": str(e)}
+    if cache_key is not None and "error" not in parsed:
+        await cacheh.set_cached_response(cache_key, parsed)
+    return parsed
+
+async def stream_llm(
+    prompt: str | List[Dict],
+    client: llm_service.LLMProvider,
+    user_id: str,
+    usage: Optional[TokenUsage] = None,
+    admitted: bool = False,
+) -> AsyncIterator[Dict]:
+    """
+    Call LLM with the streaming API. Yields {"token": text} for each new piece
+    of an OUTPUT message as it is generated, then {"response": parsed}.
+    Raises admission_service.OverloadedError like call_llm.
+    """
+    cache_key, cached = await _lookup_cache(prompt, client, user_id, usage)
+    if cached is not None:
+        message = cached.get("OUTPUT", {}).get("message") if isinstance(cached.get("OUTPUT"), dict) else None
+        if message:
+            yield {"token": message}
+        yield {"response": cached}
+        return
+    async with admission_service.get_llm_limiter().slot(admitted):
+        async for piece in _stream_llm(prompt, client, usage, cache_key):
+            yield piece
+
+async def _stream_llm(
+    prompt: str | List[Dict],
+    client: llm_service.LLMProvider,
+    usage: Optional[TokenUsage],
+    cache_key: Optional[str],
+) -> AsyncIterator[Dict]:
+    message_stream = datah.OutputMessageStream()
+    chunks = []
+    usage_metadata = None
+    start = time.perf_counter()
+    try:
+        async for chunk in client.stream(prompt):
+            chunks.append(chunk.text)
+            usage_metadata = chunk.usage_metadata or usage_metadata
+            token = message_stream.feed(chunk.text)
+            if token:
+                yield {"token": token}
+        metricsh.LLM_CALL_DURATION.labels(mode="stream", outcome="ok").observe(time.perf_counter() - start)
+        if usage is not None:
+            usage.add(usage_metadata)
+        parsed = datah.parse_llm_response("".join(chunks))
+    except Exception as e:
+        metricsh.LLM_CALL_DURATION.labels(mode="stream", outcome="error").observe(time.perf_counter() - start)
+        logger.error(f"Error streaming LLM response: {e}")
+        yield {"response": {"error": str(e)}}
+        return
+    if cache_key is not None and "error" not in parsed:
+        await cacheh.set_cached_response(cache_key, parsed)
+    yield {"response": parsed}
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import logging
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.utils.ttl_cache import TTLCache
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# LLM response cache.
+# Keys combine the user, a hash of the whitespace-normalized prompt and the
+# user's todo-state version, so every Todos write of a user makes that user's
+# previous entries unreachable and leaves everyone else's alone.
+# Entries live in a per-worker LRU; when LLM_CACHE_REDIS_URL is set they are
+# also shared through Redis, which then owns the version counter as well so
+# a write in one gunicorn worker invalidates the cache of all the others.
+
+_VERSION_KEY = "todo-agent:todos-version"
+_ENTRY_PREFIX = "todo-agent:llm:"
+_WHITESPACE = re.compile(r"\s+")
+
+_local_cache: TTLCache[str] = TTLCache(
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+)
+# One counter per user recently written by this worker, at most
+# TODO_VERSION_MAX_USERS. A user evicted and seen again starts at the highest
+# version evicted so far instead of 0, so their version never goes back to
+# one that older entries were stored under.
+_local_versions: "OrderedDict[str, int]" = OrderedDict()
+_version_floor = 0
+_redis = None
+_counters = {"shared_hits": 0, "shared_errors": 0}
+
+
+def _get_redis():
+    """Return the shared Redis client, or None when no shared backing is configured."""
+    global _redis
+    if not settings.LLM_CACHE_REDIS_URL:
+        return None
+    if _redis is None:
+        import redis.asyncio as redis  # optional dependency
+
+        _redis = redis.from_url(settings.LLM_CACHE_REDIS_URL, decode_responses=True)
+    return _redis
+
+
+def versions_shared() -> bool:
+    """True when all workers read and bump the same todo versions (through Redis)."""
+    return bool(settings.LLM_CACHE_REDIS_URL)
+
+
+async def get_todos_version(user_id: str) -> int:
+    """Current todo-state version of the user."""
+    shared = _get_redis()
+    if shared is None:
+        return _local_versions.get(user_id, _version_floor)
+    return int(await shared.get(f"{_VERSION_KEY}:{user_id}") or 0)
+
+
+async def bump_todos_version(user_id: str) -> None:
+    """Invalidate the user's cached LLM responses after their todos changed."""
+    global _version_floor
+    _local_versions[user_id] = _local_versions.pop(user_id, _version_floor) + 1
+    while len(_local_versions) > settings.TODO_VERSION_MAX_USERS:
+        _, evicted = _local_versions.popitem(last=False)
+        _version_floor = max(_version_floor, evicted)
+    shared = _get_redis()
+    if shared is None:
+        return
+    try:
+        await shared.incr(f"{_VERSION_KEY}:{user_id}")
+    except Exception as e:
+        _counters["shared_errors"] += 1
+        logger.warning(f"Failed to bump shared todos version: {e}")
+
+
+def normalize_prompt(prompt: Any) -> str:
+    """Collapse whitespace so formatting-only differences share an entry."""
+    if not isinstance(prompt, str):
+        prompt = json.dumps(prompt, sort_keys=True, default=str)
+    return _WHITESPACE.sub(" ", prompt).strip()
+
+
+async def build_cache_key(prompt: Any, user_id: str, model_name: str = "") -> Optional[str]:
+    """Cache key for a user's prompt at their current todo version, or None if unavailable."""
+    try:
+        version = await get_todos_version(user_id)
+    except Exception as e:
+        _counters["shared_errors"] += 1
+        logger.warning(f"LLM cache disabled for this call: {e}")
+        return None
+    digest = hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+    return f"{model_name}:{user_id}:{version}:{digest}"
+
+
+async def get_cached_response(key: str) -> Optional[Dict]:
+    """Look up a parsed LLM response, local LRU first and shared backing second."""
+    payload = _local_cache.get(key)
+    if payload is None:
+        shared = _get_redis()
+        if shared is None:
+            return None
+        try:
+            payload = await shared.get(_ENTRY_PREFIX + key)
+        except Exception as e:
+            _counters["shared_errors"] += 1
+            logger.warning(f"Shared LLM cache lookup failed: {e}")
+            return None
+        if payload is None:
+            return None
+        _counters["shared_hits"] += 1
+        _local_cache.set(key, payload)
+    return json.loads(payload)
+
+
+async def set_cached_response(key: str, response: Dict) -> None:
+    """Store a parsed LLM response."""
+    payload = json.dumps(response)
+    _local_cache.set(key, payload)
+    shared = _get_redis()
+    if shared is None:
+        return
+    try:
+        await shared.set(
+            _ENTRY_PREFIX + key, payload, ex=int(settings.LLM_CACHE_TTL_SECONDS)
+        )
+    except Exception as e:
+        _counters["shared_errors"] += 1
+        logger.warning(f"Shared LLM cache store failed: {e}")
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters of the LLM response cache for this worker."""
+    stats = _local_cache.stats()
+    stats.update(_counters)
+    stats["local_hits"] = stats.pop("hits")
+    stats["shared_backing"] = bool(settings.LLM_CACHE_REDIS_URL)
+    stats["misses"] = stats["misses"] - _counters["shared_hits"]
+    return stats
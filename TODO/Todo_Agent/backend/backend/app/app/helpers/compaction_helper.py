@@ -0,0 +1,52 @@
+from typing import Optional, Sequence, Tuple
+from app.helpers import text_helper as texth
+
+
+# Compaction of tool results before they are pasted into a prompt: rows are
+# encoded as "id|task" lines, and when they do not fit the token budget the
+# rows most relevant to the user input are kept and the rest are counted.
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _encode_row(todo_id: int, task: str) -> str:
+    task = " ".join(task.split()).replace("|", "/")
+    return f"{todo_id}|{task}"
+
+
+def compact_todos(
+    rows: Sequence[Tuple[int, str]], user_input: str = "", token_budget: Optional[int] = None
+) -> str:
+    """Encode (id, task) rows as a table that fits token_budget, keeping the most relevant rows."""
+    lines = {todo_id: _encode_row(todo_id, task) for todo_id, task in rows}
+    table = "id|task\n" + "\n".join(lines.values())
+    if token_budget is None or estimate_tokens(table) <= token_budget:
+        return table
+
+    # Most relevant first; among equally relevant rows prefer the newest
+    ranked = sorted(
+        rows, key=lambda row: (-texth.word_similarity(user_input, row[1]), -row[0])
+    )
+    footer_reserve = 24  # tokens kept for the omitted-rows note
+    remaining = token_budget - estimate_tokens("id|task\n") - footer_reserve
+    kept = []
+    for todo_id, _ in ranked:
+        cost = estimate_tokens(lines[todo_id] + "\n")
+        if cost > remaining:
+            break
+        kept.append(todo_id)
+        remaining -= cost
+
+    omitted = len(rows) - len(kept)
+    kept_lines = [lines[todo_id] for todo_id in sorted(kept)]
+    return (
+        "id|task\n"
+        + "\n".join(kept_lines)
+        + f"\n({omitted} of {len(rows)} todos omitted to fit the prompt; "
+        f"use search_todos to look them up)"
+    )
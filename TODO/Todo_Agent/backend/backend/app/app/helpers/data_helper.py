@@ -1,53 +1,156 @@
 import logging
 from typing import Dict
 import json
+import re
+from pydantic import ValidationError
+from app.schemas.agent import AGENT_RESPONSE_ADAPTER
 
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Recovery of malformed responses is bounded: only this much text is
+# searched, and only this many JSON object starts are tried.
+MAX_RECOVERY_CHARS = 32_768
+MAX_RECOVERY_ATTEMPTS = 4
+
+_FENCED_BLOCK = re.compile(r"```[a-zA-Z]*\s*(.*?)```", re.DOTALL)
+_STRING_JOIN = re.compile(r'"([^"]*)" \+ "\\n"\.join\(\[(.*?)\]\)')
+_QUOTED = re.compile(r'"([^"]*)"')
+# Lenient about raw control characters, which models leave inside strings
+_json_decoder = json.JSONDecoder(strict=False)
+
+
+def _join_concatenations(text: str) -> str:
+    """Replace "prefix" + "\\n".join([...]) written by the model with one string literal."""
+    match = _STRING_JOIN.search(text)
+    if match is None:
+        return text
+    strings = _QUOTED.findall(match.group(2))
+    joined = match.group(1) + "\\n" + "\\n".join(strings)
+    return text.replace(match.group(0), f'"{joined}"')
+
+
+def _cut_off(error: json.JSONDecodeError, text: str) -> bool:
+    """Whether decoding failed because the text ended inside the JSON value."""
+    if error.msg.startswith("Unterminated string"):
+        return True
+    if error.msg.startswith("Invalid \\uXXXX escape"):
+        return error.pos + 6 > len(text)
+    return error.pos >= len(text)
+
+
+def _recover(text: str) -> Dict | None:
+    """Find a valid response inside fences, prose or a truncated payload."""
+    text = text[:MAX_RECOVERY_CHARS]
+    fenced = _FENCED_BLOCK.search(text)
+    candidates = [fenced.group(1)] if fenced else []
+    candidates.append(_join_concatenations(text) if '+ "\\n".join(' in text else text)
+
+    truncated = False
+    for candidate in candidates:
+        start = candidate.find("{")
+        for _ in range(MAX_RECOVERY_ATTEMPTS):
+            if start < 0:
+                break
+            try:
+                value, end = _json_decoder.raw_decode(candidate, start)
+            except json.JSONDecodeError as e:
+                truncated = truncated or _cut_off(e, candidate)
+                start = candidate.find("{", start + 1)
+                continue
+            try:
+                return AGENT_RESPONSE_ADAPTER.validate_python(value)
+            except ValidationError:
+                # A whole object of the wrong shape (say PLAN and OUTPUT
+                # together): nothing nested inside it is the answer either
+                start = candidate.find("{", end)
+
+    # Truncated OUTPUT: keep whatever part of the message was written
+    if truncated and '"OUTPUT"' in text and '"message"' in text:
+        message = OutputMessageStream().feed(text).strip()
+        return {
+            "OUTPUT": {
+                "message": message or "Operation completed successfully",
+                "action_taken": "Processed user request",
+            }
+        }
+    return None
+
+
 def parse_llm_response(response_text: str) -> Dict:
-    """Parse LLM response with error handling."""
+    """Parse and validate an LLM response, recovering from malformed text when possible."""
+    text = response_text
+    if text.lstrip().startswith("```"):
+        # Without JSON mode the model usually fences its answer
+        fenced = _FENCED_BLOCK.search(text)
+        if fenced:
+            text = fenced.group(1)
     try:
-        cleaned = response_text.strip()
-        
-        # Handle code blocks
-        if "```json" in cleaned:
-            json_blocks = cleaned.split("```json")
-            if len(json_blocks) > 1:
-                first_block = json_blocks[1].split("```")[0].strip()
-                cleaned = first_block
-        elif cleaned.startswith("```"):
-            lines = cleaned.split('\n')
-            cleaned = '\n'.join(lines[1:-1])
-        
-        cleaned = cleaned.replace("json", "").strip()
-        
-        # Handle string concatenation patterns
-        import re
-        if '+ "\\n".join(' in cleaned:
-            pattern = r'"([^"]*)" \+ "\\n"\.join\(\[(.*?)\]\)'
-            match = re.search(pattern, cleaned)
-            if match:
-                prefix = match.group(1)
-                array_content = match.group(2)
-                strings = re.findall(r'"([^"]*)"', array_content)
-                final_string = prefix + "\\n" + "\\n".join(strings)
-                cleaned = cleaned.replace(match.group(0), f'"{final_string}"')
-        
-        try:
-            return json.loads(cleaned)
-        except json.JSONDecodeError:
-            if "OUTPUT" in cleaned and "message" in cleaned:
-                return {
-                    "OUTPUT": {
-                        "message": "Operation completed successfully",
-                        "action_taken": "Processed user request"
-                    }
-                }
-            raise
-                
-    except Exception as e:
-        logger.error(f"Failed to parse LLM response: {e}")
-        return {"error": "Failed to parse response"}
\ No newline at end of file
+        return AGENT_RESPONSE_ADAPTER.validate_json(text)
+    except ValidationError as e:
+        error = e
+    recovered = _recover(response_text)
+    if recovered is not None:
+        return recovered
+    logger.error(f"Failed to parse LLM response: {error.errors()[0]['msg']}")
+    return {"error": "Failed to parse response"}
+
+
+_OUTPUT_MESSAGE_START = re.compile(r'"OUTPUT"\s*:\s*\{[^{}]*?"message"\s*:\s*"')
+_HIGH_SURROGATE_ESCAPE = re.compile(r"\\u[dD][89abAB]")
+
+
+class OutputMessageStream:
+    """
+    Incrementally extracts OUTPUT.message from a JSON response that arrives in
+    chunks, so the message can be forwarded while the model is still writing it.
+    Responses without an OUTPUT message produce nothing.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = ""
+        self._position: int | None = None
+        self._done = False
+
+    def feed(self, chunk: str) -> str:
+        """Append a chunk and return the newly decoded part of the message."""
+        if self._done:
+            return ""
+        self._buffer += chunk
+        if self._position is None:
+            match = _OUTPUT_MESSAGE_START.search(self._buffer)
+            if match is None:
+                return ""
+            self._position = match.end()
+
+        decoded = []
+        buffer, position = self._buffer, self._position
+        while position < len(buffer):
+            char = buffer[position]
+            if char == '"':
+                self._done = True
+                break
+            if char != "\\":
+                decoded.append(char)
+                position += 1
+                continue
+            # Escape sequence: wait until it is complete before decoding it
+            length = 6 if buffer[position + 1 : position + 2] == "u" else 2
+            if _HIGH_SURROGATE_ESCAPE.match(buffer, position):
+                # Characters outside the BMP are escaped as a surrogate pair
+                # that may be split across chunks; decode both halves together
+                if position + 8 > len(buffer):
+                    break
+                if buffer[position + 6 : position + 8] == "\\u":
+                    length = 12
+            if position + length > len(buffer):
+                break
+            try:
+                decoded.append(json.loads(f'"{buffer[position : position + length]}"'))
+            except json.JSONDecodeError:
+                decoded.append(buffer[position + 1 : position + length])
+            position += length
+        self._position = position
+        return "".join(decoded)
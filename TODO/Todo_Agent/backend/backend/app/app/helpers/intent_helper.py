@@ -0,0 +1,152 @@
+import re
+from typing import Any, Optional, Set, Tuple
+
+
+# Deterministic fast path: unambiguous commands are mapped straight to a
+# database operation; anything else returns None and goes to the LLM loop.
+
+_TRAILING_PUNCTUATION = ".!?;, "
+
+_LIST_PATTERN = re.compile(
+    r"(?:(?:list|show|view|display|get)(?:\s+me)?(?:\s+all)?(?:\s+(?:my|the))?"
+    r"(?:\s+(?:todos?|tasks?|todo\s+list))?"
+    r"|(?:my\s+)?(?:todos|tasks)|what\s+are\s+my\s+(?:todos|tasks))",
+    re.IGNORECASE,
+)
+
+_DELETE_BY_ID_PATTERN = re.compile(
+    r"(?:delete|remove|drop)\s+(?:the\s+)?(?:todo\s+|task\s+)?(?:id\s*:?\s*|number\s+)?#?(\d+)",
+    re.IGNORECASE,
+)
+
+_DELETE_BY_TEXT_PATTERN = re.compile(
+    r"(?:delete|remove|drop)\s+(?:the\s+)?(?:todo\s+|task\s+)?:?\s*"
+    r"(?P<quote>[\"'“‘])(?P<task>[^\"'“”‘’]+)[\"'”’]",
+    re.IGNORECASE,
+)
+
+# "new" only counts as a verb before todo/task: "New York trip planning" is a
+# task, not a command. The "to" of "add a task to buy eggs" is dropped.
+_TASK_NOUN = r"(?:todo|task)\s*(?::\s*|\s+)(?:to\s+)?"
+_CREATE_PATTERN = re.compile(
+    rf"(?:(?:add|create)\s+(?:(?:a\s+)?(?:new\s+)?{_TASK_NOUN}|:\s*)?|(?:a\s+)?new\s+{_TASK_NOUN})"
+    r"(?P<task>.+?)(?:\s+to\s+(?:my\s+|the\s+)?(?:todo\s+|task\s+)?list)?",
+    re.IGNORECASE,
+)
+_BARE_LIST_PATTERN = re.compile(
+    r"(?:to\s+)?(?:my\s+|the\s+)?(?:todo\s+|task\s+)?list", re.IGNORECASE
+)
+
+# Words that point at existing todos or chain several commands; a create
+# containing them needs the LLM to resolve what the user means.
+_AMBIGUOUS_CREATE_PATTERN = re.compile(
+    r"\b(?:it|that|this|those|these|them|one|again|delete|remove|and\s+then)\b",
+    re.IGNORECASE,
+)
+
+_BARE_NOUNS = {"todo", "todos", "task", "tasks"}
+
+
+def route_intent(user_input: str) -> Optional[Tuple[str, Any]]:
+    """Return (tool, args) for an unambiguous command, or None to use the LLM."""
+    text = " ".join(user_input.split()).rstrip(_TRAILING_PUNCTUATION)
+    if not text:
+        return None
+
+    if _LIST_PATTERN.fullmatch(text):
+        return "get_all_todos", None
+
+    match = _DELETE_BY_ID_PATTERN.fullmatch(text)
+    if match:
+        return "delete_todos_by_id", int(match.group(1))
+
+    match = _DELETE_BY_TEXT_PATTERN.fullmatch(text)
+    if match:
+        return "delete_todos_exact", match.group("task").strip()
+
+    match = _CREATE_PATTERN.fullmatch(text)
+    if match:
+        task = match.group("task").strip(_TRAILING_PUNCTUATION + "\"'")
+        if (
+            task
+            and not task.isdigit()
+            and task.lower() not in _BARE_NOUNS
+            and not _BARE_LIST_PATTERN.fullmatch(task)
+            and not _AMBIGUOUS_CREATE_PATTERN.search(task)
+        ):
+            return "create_todos", task
+
+    return None
+
+
+# Requests that finish or remove one existing todo described in free text,
+# e.g. "I finished that shopping thing". The remaining words are the phrase
+# used to look the todo up.
+_COMPLETION_PATTERN = re.compile(
+    r"\b(?:delete|remove|drop|erase|cancel|finished|finish|completed|complete|done|did)\b",
+    re.IGNORECASE,
+)
+# Anything that selects several todos, excludes some or negates the request
+_NOT_SINGLE_REFERENCE_PATTERN = re.compile(
+    r"\b(?:all|every|everything|except|but|not|don't|dont|never|keep|and|or|first|last|\d+)\b",
+    re.IGNORECASE,
+)
+_WORD_PATTERN = re.compile(r"[\w']+")
+_STOP_WORDS = {
+    "a", "an", "the", "that", "this", "those", "these", "it", "one", "thing",
+    "stuff", "task", "todo", "i", "i'm", "im", "i've", "ive", "my", "me", "we",
+    "with", "about", "of", "to", "for", "on", "in", "at", "please", "just",
+    "already", "have", "has", "am", "is", "was", "so", "can", "you", "want",
+    "what", "said", "which", "thingy", "now", "yes",
+}
+
+
+def _reference_phrase(text: str, command_words: Set[str] = frozenset()) -> Optional[str]:
+    words = [
+        word
+        for word in _WORD_PATTERN.findall(text.lower())
+        if word not in _STOP_WORDS
+        and word not in command_words
+        and not _COMPLETION_PATTERN.fullmatch(word)
+    ]
+    return " ".join(words) or None
+
+
+def extract_reference(user_input: str) -> Optional[str]:
+    """
+    Phrase naming the single todo a finish/remove request may refer to, or
+    None. Loose on purpose ("Did I add the dentist appointment?" matches too):
+    it only picks the candidates shown to the LLM, never what gets deleted.
+    """
+    if not _COMPLETION_PATTERN.search(user_input):
+        return None
+    if _NOT_SINGLE_REFERENCE_PATTERN.search(user_input):
+        return None
+    return _reference_phrase(user_input)
+
+
+# Commands explicit enough to delete the best match without asking the LLM:
+# an imperative delete/complete verb first and no question. "finish",
+# "complete", "cancel" and "drop" are left out, since todos themselves
+# start with them ("Finish the quarterly report", "Drop off the parcel").
+_DELETE_COMMAND_PATTERN = re.compile(
+    r"(?:please\s+)?(?P<verb>delete|remove|erase|(?:cross|check|tick)\s+off|mark)\b(?P<rest>.*)",
+    re.IGNORECASE,
+)
+_MARK_DONE_PATTERN = re.compile(r"\b(?:as\s+)?(?:done|completed?|finished)$", re.IGNORECASE)
+_COMMAND_WORDS = {"cross", "check", "tick", "off", "mark", "as"}
+
+
+def extract_delete_command(user_input: str) -> Optional[str]:
+    """Phrase naming the todo an explicit single-todo delete command refers to, or None."""
+    text = " ".join(user_input.split()).rstrip(_TRAILING_PUNCTUATION)
+    if "?" in text:
+        return None
+    match = _DELETE_COMMAND_PATTERN.fullmatch(text)
+    if not match:
+        return None
+    if match.group("verb").lower() == "mark" and not _MARK_DONE_PATTERN.search(text):
+        return None
+    if _NOT_SINGLE_REFERENCE_PATTERN.search(text):
+        return None
+    return _reference_phrase(match.group("rest"), _COMMAND_WORDS)
@@ -0,0 +1,116 @@
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+
+# Prometheus metrics for the hot paths: routes, the LLM, agent tools, the DB
+# pool and the weather upstream. Under gunicorn every worker is a separate
+# process, so PROMETHEUS_MULTIPROC_DIR must point to a directory shared by all
+# of them (see gunicorn_conf.py and docker-compose.yml); /metrics then
+# aggregates the per-process files instead of reporting whichever worker
+# happened to answer.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+KNOWN_TOOLS = frozenset(
+    {
+        "get_all_todos",
+        "search_todos",
+        "create_todos",
+        "delete_todos",
+        "delete_todos_exact",
+        "delete_todos_by_id",
+    }
+)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to produce the response headers, per route",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_CALL_DURATION = Histogram(
+    "llm_call_duration_seconds",
+    "Latency of LLM calls (cache hits excluded)",
+    ["mode", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_PROVIDER_EVENTS = Counter(
+    "llm_provider_events_total",
+    "Hedges, fallbacks, errors and exceeded budgets per LLM provider",
+    ["provider", "event"],
+)
+LLM_IN_FLIGHT = Gauge(
+    "llm_in_flight_calls",
+    "LLM calls holding an admission slot",
+    multiprocess_mode="livesum",
+)
+LLM_QUEUE_WAIT = Histogram(
+    "llm_queue_wait_seconds",
+    "Time LLM calls waited for an admission slot",
+    buckets=LATENCY_BUCKETS,
+)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total",
+    "Requests refused by admission control (rate_limited, queue_full, queue_timeout)",
+    ["reason"],
+)
+LLM_CACHE_HITS = Counter("llm_cache_hits_total", "LLM calls answered from the response cache")
+AGENT_REQUESTS = Counter(
+    "agent_requests_total", "Agent requests by the path that answered them", ["path"]
+)
+AGENT_ITERATIONS = Histogram(
+    "agent_iterations",
+    "LLM iterations used by agent requests that reached the LLM loop",
+    buckets=(1, 2, 3, 4, 5, 6),
+)
+TOOL_CALLS = Counter("agent_tool_calls_total", "Agent tool executions", ["tool", "outcome"])
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent getting a connection from the async engine pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_POOL_EVENTS = Counter(
+    "db_pool_events_total",
+    "Async engine checkouts that opened an overflow connection or timed out",
+    ["event"],
+)
+DB_POOL_CAPACITY = Gauge(
+    "db_pool_capacity_connections",
+    "Configured pool_size + max_overflow of the async engine, summed over workers",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections currently checked out of the async engine pool",
+    multiprocess_mode="livesum",
+)
+WEATHER_UPSTREAM_DURATION = Histogram(
+    "weather_upstream_duration_seconds",
+    "Latency of calls to the weather API",
+    ["client"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+def tool_label(tool: object) -> str:
+    """Tool name as a metric label; names invented by the LLM are folded into one."""
+    return tool if tool in KNOWN_TOOLS else "unknown"
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Exposition payload and its content type, aggregated over workers when multiprocess."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
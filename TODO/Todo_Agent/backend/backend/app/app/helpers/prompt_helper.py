@@ -1,13 +1,16 @@
-from typing import Dict
+import re
+from typing import Any, Dict, Sequence
 
 
 SYSTEM_PROMPT = """
 You are an intelligent TodoAgent that understands natural language and manages todo tasks. You have access to database operations and should use your reasoning abilities to understand user intent, even when it's expressed indirectly or ambiguously.
 
 🛠 Available Database Operations:
-- get_all_todos() → retrieves all existing todos with their IDs
+- get_all_todos() → retrieves existing todos as an "id|task" table; long lists keep the rows most relevant to the request and say how many were omitted
 - create_todos(task: str) → creates a new todo task
-- delete_todos(task: str) → deletes a todo by text matching
+- search_todos(query: str) → returns the best fuzzy matches for a description, ranked, with their IDs
+- delete_todos(task: str) → deletes the single best fuzzy match for the text
+- delete_todos_exact(task: str) → deletes a todo whose text matches exactly (case-insensitive)
 - delete_todos_by_id(task_id: int) → deletes a todo by specific ID
 
 🧠 Use Your Natural Language Understanding:
@@ -44,9 +47,9 @@ For statements that don't represent actionable tasks:
 When you encounter non-actionable statements, respond honestly: "That doesn't sound like a todo task to me. Could you please let me know what you're trying to add more clearly?"
 
 🔄 Multi-Step Reasoning Examples:
-- "Remove the market one" → Get all todos → Find todo containing "market" → Delete by ID
+- "Remove the market one" → Search todos for "market" → Delete the best match by ID
 - "I completed the first task I mentioned" → Get all todos → Identify likely candidate → Confirm and delete
-- "Clear everything except the school one" → Get all todos → Delete all except school-related → Confirm results
+- "Clear everything except the school one" → Get all todos → Delete all except school-related in ONE step using "operations" → Confirm results
 - "Change my mind about telling my friend" → Get all todos → Find friend-related task → Delete it
 - "I want to go to market" → Extract task "go to market" → Create new todo
 - "There is a tree in my street" → Recognize as non-actionable → Ask for clarification
@@ -66,13 +69,14 @@ When you encounter non-actionable statements, respond honestly: "That doesn't so
 - Use proper escaping for newlines (\\n)
 - Be honest about database operation results
 - When you execute a database operation, you should return the actual results of that operation
-- For bulk operations, process items individually
+- For bulk operations, send every write in ONE step as an "operations" list instead of one step per item; the list runs in a single transaction and you get a result per operation
 
 **🔄 MULTI-STEP OPERATIONS:**
 For complex operations requiring multiple database calls:
 1. Use PLAN for the first step
 2. Use CONTINUE for subsequent steps  
 3. Use OUTPUT only when the entire operation is complete
+4. When a step needs several writes, replace "tool"/"args" with "operations": [{"tool": "...", "args": "..."}, ...]
 
 Response Format - Return ONE of these at a time:
 
@@ -111,37 +115,73 @@ Remember: You're an intelligent assistant, not a rigid rule-follower. Use your n
 """
 
 
-def build_prompt(base_prompt: str, user_input: str, context: Dict = None) -> str:
-    """Build prompt based on context."""
+# Every LLM call gets one self-contained step prompt: the step number, the
+# user input, a one-line summary of each earlier step and the latest tool
+# result in full. SYSTEM_PROMPT travels as the system instruction, and earlier
+# tool results (up to TOOL_RESULT_TOKEN_BUDGET each) are never sent again.
+
+SUMMARY_MAX_CHARS = 160
+_STEP_PATTERN = re.compile(r"Step (\d+) of at most \d+\.")
+
+
+def _clip(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= SUMMARY_MAX_CHARS else text[: SUMMARY_MAX_CHARS - 3] + "..."
+
+
+def step_summary(tool: str, args: Any, success: bool, result: str) -> str:
+    """One line recording an executed step: the call and the headline of its result."""
+    headline = result.split("\n", 1)[0]
+    return f"{_clip(f'{tool}({args})')} -> {'succeeded' if success else 'failed'}: {_clip(headline)}"
+
+
+def step_number(prompt: str) -> int:
+    """Step number stated by a prompt of build_step_prompt (1 if there is none)."""
+    match = _STEP_PATTERN.match(prompt)
+    return int(match.group(1)) if match else 1
+
+
+def build_step_prompt(
+    user_input: str,
+    context: Dict = None,
+    earlier_steps: Sequence[str] = (),
+    step: int = 1,
+    max_steps: int = 5,
+) -> str:
+    """Build the prompt of one agent step from the latest context and the earlier step summaries."""
+    prompt = f"Step {step} of at most {max_steps}.\nUser input: {user_input}\n"
+    if earlier_steps:
+        prompt += "Earlier steps:\n" + "".join(
+            f"{index}. {summary}\n" for index, summary in enumerate(earlier_steps, start=1)
+        )
     if context is None:
-        return f"{base_prompt}\n\nUser input: {user_input}\n"
-    
-    if context.get("type") == "continue":
-        return (
-            f"{base_prompt}\n\n"
-            f"User input: {user_input}\n"
+        return prompt
+
+    if context.get("type") == "candidates":
+        return prompt + (
+            f"Todos similar to the user's words (id|task|score):\n{context['candidates']}\n"
+            f"These are only lookup results. If the request acts on one of them, use its ID instead of calling get_all_todos."
+        )
+    elif context.get("type") == "continue":
+        return prompt + (
             f"Previous operation: {context['tool']}({context['args']})\n"
             f"Operation success: {context['success']}\n"
             f"Operation result: {context['result']}\n"
             f"Continue with the next step to complete the user's request."
         )
     elif context.get("type") == "output":
-        return (
-            f"{base_prompt}\n\n"
-            f"User input: {user_input}\n"
-            f"You planned: {context.get('plan', {})}\n"
+        return prompt + (
+            f"Database operation: {context['tool']}({context['args']})\n"
             f"Database operation success: {context['success']}\n"
             f"Database result: {context['result']}\n"
             f"Now provide OUTPUT with a user-friendly response."
         )
     elif context.get("type") == "final_output":
-        return (
-            f"{base_prompt}\n\n"
-            f"User input: {user_input}\n"
+        return prompt + (
             f"Final operation: {context['tool']}({context['args']})\n"
             f"Operation success: {context['success']}\n"
             f"Operation result: {context['result']}\n"
             f"Now provide OUTPUT with a user-friendly response about the completed operation."
         )
-    
-    return f"{base_prompt}\n\nUser input: {user_input}\n"
\ No newline at end of file
+
+    return prompt
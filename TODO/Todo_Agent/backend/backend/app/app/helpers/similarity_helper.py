@@ -0,0 +1,187 @@
+import logging
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.helpers import cache_helper as cacheh
+from app.helpers import text_helper as texth
+from app.services.snapshot_service import load_todo_rows
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Hashed character-trigram features; collisions at this width are rare for
+# short todo texts and the vectors are only ever stored sparsely.
+FEATURE_DIM = 1 << 18
+
+
+def _features(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Sparse term-frequency vector of text as (feature indices, counts)."""
+    counts: Dict[int, float] = {}
+    for gram in texth.trigrams(text):
+        index = zlib.crc32(gram.encode("utf-8")) % FEATURE_DIM
+        counts[index] = counts.get(index, 0.0) + 1.0
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    return indices, values
+
+
+class TodoSimilarityIndex:
+    """
+    In-process TF-IDF index over one user's todo texts. Rows are kept sparse
+    and packed into CSR arrays on demand, so a query is a handful of
+    vectorized NumPy operations over all stored features. Document
+    frequencies are counted while packing, so an index takes memory in
+    proportion to its todos; add/remove only touch the per-row dictionary and
+    the packed arrays are rebuilt lazily on the next query.
+    """
+
+    def __init__(self) -> None:
+        self._rows: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._packed: Optional[Tuple[np.ndarray, ...]] = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, todo_id: int, text: str) -> None:
+        self.remove(todo_id)
+        indices, values = _features(text)
+        if len(indices) == 0:
+            return  # no word characters, nothing could ever match it
+        self._rows[todo_id] = (indices, values)
+        self._packed = None
+
+    def remove(self, todo_id: int) -> None:
+        if self._rows.pop(todo_id, None) is not None:
+            self._packed = None
+
+    def rebuild(self, rows: Iterable[Tuple[int, str]]) -> None:
+        self._rows.clear()
+        self._packed = None
+        for todo_id, text in rows:
+            self.add(todo_id, text)
+
+    def _idf(self, features: np.ndarray, doc_features: np.ndarray, doc_freq: np.ndarray) -> np.ndarray:
+        """IDF of features, given the sorted features present in documents and their counts."""
+        position = np.minimum(np.searchsorted(doc_features, features), len(doc_features) - 1)
+        freq = np.where(doc_features[position] == features, doc_freq[position], 0)
+        return (np.log((len(self._rows) + 1) / (freq + 1)) + 1.0).astype(np.float32)
+
+    def _pack(self) -> Tuple[np.ndarray, ...]:
+        if self._packed is None:
+            ids = np.fromiter(self._rows.keys(), dtype=np.int64, count=len(self._rows))
+            lengths = np.fromiter((len(row[0]) for row in self._rows.values()), dtype=np.int64, count=len(self._rows))
+            indices = np.concatenate([row[0] for row in self._rows.values()])
+            values = np.concatenate([row[1] for row in self._rows.values()])
+            offsets = np.zeros(len(lengths), dtype=np.int64)
+            np.cumsum(lengths[:-1], out=offsets[1:])
+            # Features are unique within a row, so their counts are document frequencies
+            doc_features, doc_freq = np.unique(indices, return_counts=True)
+            weighted = values * self._idf(indices, doc_features, doc_freq)
+            norms = np.sqrt(np.add.reduceat(weighted * weighted, offsets))
+            self._packed = (ids, indices, weighted, offsets, norms, doc_features, doc_freq)
+        return self._packed
+
+    def top_k(self, text: str, k: int) -> List[Tuple[int, float]]:
+        """IDs of the k most similar todos with their cosine score, best first."""
+        if not self._rows:
+            return []
+        ids, indices, weighted, offsets, norms, doc_features, doc_freq = self._pack()
+        query_indices, query_values = _features(text)
+        if len(query_indices) == 0:
+            return []
+        query = np.zeros(FEATURE_DIM, dtype=np.float32)
+        query[query_indices] = query_values * self._idf(query_indices, doc_features, doc_freq)
+        query /= np.linalg.norm(query)
+
+        scores = np.add.reduceat(weighted * query[indices], offsets) / norms
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.lexsort((ids[best], -scores[best]))]
+        return [(int(ids[i]), float(scores[i])) for i in best if scores[i] > 0]
+
+
+class _UserIndex:
+    """A user's index, their todo texts and the todo-state version both reflect."""
+
+    def __init__(self) -> None:
+        self.index = TodoSimilarityIndex()
+        self.texts: Dict[int, str] = {}
+        self.synced_version: Optional[int] = None
+
+
+# Per-worker indexes of the SIMILARITY_MAX_USERS most recently active users;
+# an evicted user's index is rebuilt from the database on their next query.
+# Each is tagged with the todo version it reflects, which only covers other
+# workers' writes when LLM_CACHE_REDIS_URL shares the versions. That is why
+# SIMILARITY_DIRECT_DELETE (delete a decisive match without the LLM) is off
+# by default and ignored with several workers and no Redis.
+_indexes: "OrderedDict[str, _UserIndex]" = OrderedDict()
+
+
+def _user_index(user_id: str) -> _UserIndex:
+    entry = _indexes.get(user_id)
+    if entry is None:
+        entry = _indexes[user_id] = _UserIndex()
+        while len(_indexes) > settings.SIMILARITY_MAX_USERS:
+            _indexes.popitem(last=False)
+    _indexes.move_to_end(user_id)
+    return entry
+
+
+async def top_k(db, user_id: str, text: str, k: int) -> List[Tuple[int, str, float]]:
+    """Top-k (id, task, score) candidates among the user's todos, rebuilding if they changed."""
+    entry = _user_index(user_id)
+    version = await cacheh.get_todos_version(user_id)
+    if entry.synced_version != version:
+        rows = await load_todo_rows(db, user_id)
+        entry.index.rebuild(rows)
+        entry.texts = dict(rows)
+        entry.synced_version = version
+        logger.debug(f"Rebuilt similarity index of {user_id} with {len(rows)} todos at version {version}")
+    return [(todo_id, entry.texts.get(todo_id, ""), score) for todo_id, score in entry.index.top_k(text, k)]
+
+
+def record_create(user_id: str, todo_id: int, task: str) -> None:
+    entry = _indexes.get(user_id)
+    if entry is not None:
+        entry.index.add(todo_id, task)
+        entry.texts[todo_id] = task
+
+
+def record_delete(user_id: str, todo_id: int) -> None:
+    entry = _indexes.get(user_id)
+    if entry is not None:
+        entry.index.remove(todo_id)
+        entry.texts.pop(todo_id, None)
+
+
+async def sync_after_local_write(user_id: str) -> None:
+    """
+    Keep the user's incrementally updated index if this worker's write was
+    the only change since it was last synced; otherwise it is rebuilt on the
+    next query.
+    """
+    entry = _indexes.get(user_id)
+    if entry is None or entry.synced_version is None:
+        return
+    version = await cacheh.get_todos_version(user_id)
+    entry.synced_version = version if version == entry.synced_version + 1 else None
+
+
+def invalidate(user_id: str) -> None:
+    entry = _indexes.get(user_id)
+    if entry is not None:
+        entry.synced_version = None
+
+
+def is_decisive(candidates: List[Tuple[int, str, float]], min_score: float, min_margin: float) -> bool:
+    """True when the best candidate is good enough and clearly ahead of the runner-up."""
+    if not candidates or candidates[0][2] < min_score:
+        return False
+    runner_up = candidates[1][2] if len(candidates) > 1 else 0.0
+    return candidates[0][2] - runner_up >= min_margin
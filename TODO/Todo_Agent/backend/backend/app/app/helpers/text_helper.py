@@ -0,0 +1,40 @@
+import re
+from typing import FrozenSet
+
+
+# Trigram matching compatible with Postgres pg_trgm, used where the database
+# cannot rank matches itself.
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """Trigram set of text, padded per word the way pg_trgm does."""
+    grams = set()
+    for word in _NON_WORD.split(text.lower()):
+        if not word:
+            continue
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def similarity(a: str, b: str) -> float:
+    """Share of trigrams two strings have in common (pg_trgm similarity)."""
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+
+def word_similarity(query: str, text: str) -> float:
+    """Share of the query's trigrams found in text; approximates pg_trgm word_similarity."""
+    grams_query = trigrams(query)
+    if not grams_query:
+        return 0.0
+    return len(grams_query & trigrams(text)) / len(grams_query)
+
+
+def significant_words(text: str, min_length: int = 3) -> list[str]:
+    """Lower-cased words long enough to contribute whole trigrams."""
+    return [word for word in _NON_WORD.split(text.lower()) if len(word) >= min_length]
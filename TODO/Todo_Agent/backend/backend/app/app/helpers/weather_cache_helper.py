@@ -0,0 +1,36 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from app.core.config import settings
+from app.utils.swr_cache import SWRCache
+
+
+# City-keyed weather cache in front of the upstream weather API. Weather
+# changes slowly, so entries are served fresh for WEATHER_CACHE_TTL_SECONDS and
+# stale (while one background request refreshes them) for a further
+# WEATHER_CACHE_STALE_SECONDS. Concurrent misses for one city share a single
+# upstream request.
+
+_cache: SWRCache[Dict[str, Any]] = SWRCache(
+    max_entries=settings.WEATHER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.WEATHER_CACHE_TTL_SECONDS,
+    stale_seconds=settings.WEATHER_CACHE_STALE_SECONDS,
+)
+
+
+def normalize_city(city: str) -> str:
+    """Cache key for a city name: case-folded with whitespace collapsed."""
+    return " ".join(city.split()).casefold()
+
+
+async def get_weather(city: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Weather for city from the cache, calling fetch on a miss."""
+    if not settings.WEATHER_CACHE_ENABLED:
+        return await fetch()
+    weather = await _cache.get_or_load(normalize_city(city), fetch)
+    # Entries are shared between spellings of the city; echo the caller's one
+    return {**weather, "city": city}
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Counters of the weather cache for this worker."""
+    return {"enabled": settings.WEATHER_CACHE_ENABLED, **_cache.stats()}
@@ -1,8 +1,15 @@
 from fastapi import (
     FastAPI,
+    Request,
+    Response,
 )
+import time
 from app.api.v1.api import api_router as api_router_v1
 from app.core.config import settings
+from app.db import session as db_session
+from app.services import http_service, warmup_service
+from app.helpers import metrics_helper as metricsh
+from app.services.job_service import JobWorkerPool, create_broker
 from contextlib import asynccontextmanager
 from starlette.middleware.cors import CORSMiddleware
 
@@ -11,8 +18,19 @@ from starlette.middleware.cors import CORSMiddleware
 async def lifespan(app: FastAPI):
     # Startup
     print("startup fastapi")
+    await db_session.init_engines()
+    app.state.http_client = http_service.create_async_client()
+    app.state.http_sync_client = http_service.create_sync_client()
+    if settings.WARM_UP_ENABLED:
+        await warmup_service.warm_up(app.state.http_client)
+    app.state.job_pool = JobWorkerPool(create_broker(), settings.JOB_WORKERS)
+    app.state.job_pool.start()
     yield
     # shutdown
+    await app.state.job_pool.stop()
+    await app.state.http_client.aclose()
+    app.state.http_sync_client.close()
+    await db_session.dispose_engines()
     print("shutdown fastapi")
     
 
@@ -35,6 +53,33 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to keep the series bounded
+        route = request.scope.get("route")
+        metricsh.HTTP_REQUEST_DURATION.labels(
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        ).observe(time.perf_counter() - start)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus metrics, aggregated over all gunicorn workers.
+    """
+    payload, content_type = metricsh.render_metrics()
+    return Response(content=payload, media_type=content_type)
+
+
 @app.get("/")
 async def root():
     """
@@ -1,47 +1,255 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import ARRAY, DDL, Column, Index, Integer, String, DateTime, any_, bindparam, delete, event, func, insert, literal, or_, select, text, tuple_
 from datetime import UTC,datetime
 from app.db.session import Base
-from sqlalchemy.orm import Session
+from app.helpers import cache_helper as cacheh
+from app.helpers import text_helper as texth
+from app.core.config import settings
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, List, Optional, Sequence, Set, Tuple
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+# With TODO_HASH_PARTITIONS set, Postgres hash-partitions the table by
+# user_id into that many partitions. Keys of a partitioned table must contain
+# the partition column, so user_id then joins the primary key.
+HASH_PARTITIONS = settings.TODO_HASH_PARTITIONS
+
+
+# Whether the database has pg_trgm, checked on the first Postgres search.
+# The extension is created with the table, but tables made before it (or
+# by hand) may lack it; search then ranks in Python like on other backends.
+_trgm_available: Optional[bool] = None
+
+
+async def _has_trgm(db: AsyncSession) -> bool:
+    global _trgm_available
+    if _trgm_available is None:
+        _trgm_available = bool(
+            await db.scalar(text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')"))
+        )
+        if not _trgm_available:
+            logger.warning(
+                "pg_trgm is not installed, fuzzy todo search falls back to Python ranking; "
+                "see the README for the migration"
+            )
+    return _trgm_available
+
+
+def _utcnow() -> datetime:
+    # Naive UTC: the columns are TIMESTAMP WITHOUT TIME ZONE and asyncpg
+    # rejects timezone-aware values for them.
+    return datetime.now(UTC).replace(tzinfo=None)
+
 
 class Todos(Base):
+    """
+    Todos of all users. Every classmethod takes the owner's user_id and only
+    reads or writes that user's rows, through indexes led by user_id.
+    """
+
     __tablename__ = "Todos"
-    
-    id = Column(Integer, primary_key=True, index=True)
+    __table_args__ = (
+        # Trigram GIN index backing search_todos on Postgres. Leading with
+        # user_id (through btree_gin) keeps the scan to the user's own rows
+        # instead of every user's trigram matches; needs pg_trgm and btree_gin
+        Index(
+            "ix_todos_user_id_todo_task_trgm",
+            "user_id",
+            "todo_task",
+            postgresql_using="gin",
+            postgresql_ops={"todo_task": "gin_trgm_ops"},
+        ),
+        # A user's todos in keyset pagination order, used by get_todos_page
+        Index("ix_todos_user_id_created_at_id", "user_id", "created_at", "id"),
+        {"postgresql_partition_by": "HASH (user_id)"} if HASH_PARTITIONS else {},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    user_id = Column(String(64), primary_key=bool(HASH_PARTITIONS), nullable=False)
     todo_task = Column(String, nullable=False)
-    created_at = Column(DateTime,default=datetime.now(UTC))
-    updated_at = Column(DateTime, default=datetime.now(UTC))
-  
+    created_at = Column(DateTime, default=_utcnow)
+    updated_at = Column(DateTime, default=_utcnow)
+
+    @classmethod
+    async def _finish_write(cls,db: AsyncSession, user_id: str, commit: bool):
+        # commit=False leaves the transaction open for batched operations;
+        # flushing still surfaces errors and assigns IDs.
+        if commit:
+            await db.commit()
+            await cacheh.bump_todos_version(user_id)
+        else:
+            await db.flush()
+
     @classmethod
-    def get_all_todos(cls,db: Session= Session):
-        print("Fetching all todos...")
-        result= db.query(cls).all()
-        return result
+    async def get_all_todos(cls,db: AsyncSession, user_id: str):
+        logger.debug(f"Fetching all todos of {user_id}")
+        result = await db.scalars(select(cls).where(cls.user_id == user_id))
+        return result.all()
 
     @classmethod
-    def create_todos(cls,db: Session, task: str):
-        print(f"Creating new task: {task}")
-        new_task = cls(todo_task=task)
+    async def get_todos_page(cls,db: AsyncSession, user_id: str, size: int, after: Optional[Tuple[datetime, int]] = None):
+        """Up to size of the user's todos ordered by (created_at, id), starting after the given key."""
+        logger.debug(f"Fetching page of {size} todos of {user_id}")
+        query = select(cls).where(cls.user_id == user_id).order_by(cls.created_at, cls.id).limit(size)
+        if after is not None:
+            query = query.where(tuple_(cls.created_at, cls.id) > tuple_(*after))
+        result = await db.scalars(query)
+        return result.all()
+
+    @classmethod
+    async def stream_todos(cls,db: AsyncSession, user_id: str, chunk_size: int) -> AsyncIterator[Sequence]:
+        """Yield the user's todos in chunks from a server-side cursor, never loading them all."""
+        logger.debug(f"Streaming todos of {user_id} in chunks of {chunk_size}")
+        result = await db.stream(
+            select(cls.id, cls.todo_task, cls.created_at, cls.updated_at)
+            .where(cls.user_id == user_id)
+            .order_by(cls.created_at, cls.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        async for rows in result.partitions():
+            yield rows
+
+    @classmethod
+    async def count_todos(cls,db: AsyncSession, user_id: str) -> int:
+        return await db.scalar(select(func.count()).select_from(cls).where(cls.user_id == user_id))
+
+    @classmethod
+    async def create_todos(cls,db: AsyncSession, user_id: str, task: str, commit: bool = True):
+        logger.debug(f"Creating a task for {user_id}")
+        new_task = cls(user_id=user_id, todo_task=task)
         db.add(new_task)
-        db.commit()
-        db.refresh(new_task)
+        await cls._finish_write(db, user_id, commit)
+        if commit:
+            await db.refresh(new_task)
         return new_task.id # Return the ID of the created task
-    
+
+    @classmethod
+    async def search_todos(cls,db: AsyncSession, user_id: str, query: str, limit: Optional[int] = None) -> List[Tuple["Todos", float]]:
+        """The user's todos ranked by fuzzy match against query, best first (ties by lowest ID)."""
+        logger.debug(f"Searching todos of {user_id}")
+        limit = limit or settings.TODO_MATCH_LIMIT
+        if db.bind.dialect.name == "postgresql" and await _has_trgm(db):
+            # user_id = ... AND query <% todo_task is answered from the trigram GIN index
+            score = func.word_similarity(query, cls.todo_task).label("score")
+            result = await db.execute(
+                select(cls, score)
+                .where(cls.user_id == user_id)
+                .where(literal(query).op("<%")(cls.todo_task))
+                .where(score >= settings.TODO_MATCH_MIN_SCORE)
+                .order_by(score.desc(), cls.id)
+                .limit(limit)
+            )
+            return [(todo, float(todo_score)) for todo, todo_score in result.all()]
+
+        # Other backends and Postgres without pg_trgm: narrow with LIKE on the
+        # query's words, rank in Python
+        words = texth.significant_words(query) or [query.lower()]
+        candidates = await db.scalars(
+            select(cls)
+            .where(cls.user_id == user_id)
+            .where(or_(*(cls.todo_task.ilike(f"%{word}%") for word in words)))
+        )
+        ranked = [(todo, texth.word_similarity(query, todo.todo_task)) for todo in candidates]
+        ranked = [item for item in ranked if item[1] >= settings.TODO_MATCH_MIN_SCORE]
+        ranked.sort(key=lambda item: (-item[1], item[0].id))
+        return ranked[:limit]
+
     @classmethod
-    def delete_todos(cls,db: Session, task: int):
-        print(f"Attempting to delete task: {task}")
-        task_exist = db.query(cls).filter(cls.todo_task.ilike(f"%{task}%")).first()
+    async def delete_todos(cls,db: AsyncSession, user_id: str, task: str, commit: bool = True):
+        logger.debug(f"Deleting a task of {user_id} by text")
+        matches = await cls.search_todos(db, user_id, task, limit=1)
+        task_exist = matches[0][0] if matches else None
         if task_exist:
-            db.delete(task_exist)
-            db.commit()
-            return True
-        return False
-    
+            await db.delete(task_exist)
+            await cls._finish_write(db, user_id, commit)
+            return task_exist.id # Return the ID of the deleted task
+        return None
+
+    @classmethod
+    async def delete_todos_exact(cls,db: AsyncSession, user_id: str, task: str, commit: bool = True):
+        logger.debug(f"Deleting a task of {user_id} by exact text")
+        task_exist = await db.scalar(
+            select(cls)
+            .where(cls.user_id == user_id)
+            .filter(func.lower(cls.todo_task) == task.lower())
+            .order_by(cls.id)
+            .limit(1)
+        )
+        if task_exist:
+            await db.delete(task_exist)
+            await cls._finish_write(db, user_id, commit)
+            return task_exist.id # Return the ID of the deleted task
+        return None
+
     @classmethod
-    def delete_todos_by_id(cls,db: Session, task_id: int):
-        print(f"Attempting to delete task with ID: {task_id}")
-        task_exist = db.query(cls).filter(cls.id == task_id).first()
+    async def delete_todos_by_id(cls,db: AsyncSession, user_id: str, task_id: int, commit: bool = True):
+        logger.debug(f"Deleting task {task_id} of {user_id}")
+        # Not db.get: the ID alone would find other users' todos too
+        task_exist = await db.scalar(select(cls).where(cls.user_id == user_id, cls.id == task_id))
         if task_exist:
-            db.delete(task_exist)
-            db.commit()
+            await db.delete(task_exist)
+            await cls._finish_write(db, user_id, commit)
             return True
-        return False
\ No newline at end of file
+        return False
+
+    @classmethod
+    async def bulk_create_todos(cls,db: AsyncSession, user_id: str, tasks: Sequence[str]) -> List[Tuple[int, str]]:
+        logger.debug(f"Bulk creating {len(tasks)} tasks for {user_id}")
+        if not tasks:
+            return []
+        now = _utcnow()
+        # executemany + RETURNING is sent as multi-row INSERT ... VALUES ...
+        # RETURNING pages; sort_by_parameter_order keeps rows aligned with tasks.
+        result = await db.execute(
+            insert(cls).returning(cls.id, cls.todo_task, sort_by_parameter_order=True),
+            [{"user_id": user_id, "todo_task": task, "created_at": now, "updated_at": now} for task in tasks],
+        )
+        rows = [(row.id, row.todo_task) for row in result]
+        await cls._finish_write(db, user_id, commit=True)
+        return rows
+
+    @classmethod
+    async def bulk_delete_todos_by_id(cls,db: AsyncSession, user_id: str, task_ids: Sequence[int]) -> Set[int]:
+        logger.debug(f"Bulk deleting {len(task_ids)} tasks of {user_id}")
+        if not task_ids:
+            return set()
+        if db.bind.dialect.name == "postgresql":
+            # One array parameter: DELETE ... WHERE id = ANY($1)
+            condition = cls.id == any_(bindparam("task_ids", list(task_ids), type_=ARRAY(Integer)))
+        else:
+            condition = cls.id.in_(list(task_ids))
+        result = await db.execute(
+            delete(cls)
+            .where(cls.user_id == user_id)
+            .where(condition)
+            .returning(cls.id)
+            .execution_options(synchronize_session=False)
+        )
+        deleted = set(result.scalars().all())
+        await cls._finish_write(db, user_id, commit=True)
+        return deleted
+
+
+for extension in ("pg_trgm", "btree_gin"):
+    event.listen(
+        Todos.__table__,
+        "before_create",
+        DDL(f"CREATE EXTENSION IF NOT EXISTS {extension}").execute_if(dialect="postgresql"),
+    )
+
+# Exact-text lookups of delete_todos_exact
+Index("ix_todos_user_id_lower_task", Todos.user_id, func.lower(Todos.todo_task))
+
+if HASH_PARTITIONS:
+    for remainder in range(HASH_PARTITIONS):
+        event.listen(
+            Todos.__table__,
+            "after_create",
+            DDL(
+                f'CREATE TABLE IF NOT EXISTS "Todos_p{remainder}" PARTITION OF "Todos" '
+                f"FOR VALUES WITH (MODULUS {HASH_PARTITIONS}, REMAINDER {remainder})"
+            ).execute_if(dialect="postgresql"),
+        )
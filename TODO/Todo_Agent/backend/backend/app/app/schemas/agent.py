@@ -0,0 +1,106 @@
+from pydantic import AfterValidator, ConfigDict, TypeAdapter
+from typing import Any, List
+from typing_extensions import Annotated, NotRequired, TypedDict
+
+# Shape of one agent LLM response: exactly one of PLAN, CONTINUE or OUTPUT.
+# TypedDicts validate straight into plain dicts, which is what the agent loop
+# consumes. Extra keys the model adds (reasoning, expected_outcome, ...) are
+# kept so the conversation history shows the model its own answer.
+
+class AgentOperation(TypedDict):
+    __pydantic_config__ = ConfigDict(extra="allow")
+
+    tool: str
+    args: Any
+
+class AgentStep(TypedDict):
+    __pydantic_config__ = ConfigDict(extra="allow")
+
+    tool: NotRequired[str]
+    args: NotRequired[Any]
+    operations: NotRequired[List[AgentOperation]]
+    is_multi_step: NotRequired[bool]
+    is_final_step: NotRequired[bool]
+
+class AgentOutput(TypedDict):
+    __pydantic_config__ = ConfigDict(extra="allow")
+
+    message: NotRequired[str]
+    action_taken: NotRequired[str]
+
+def _has_action(step: dict) -> dict:
+    if "tool" not in step and not step.get("operations"):
+        raise ValueError("a step needs a tool or an operations list")
+    return step
+
+def _exactly_one(response: dict) -> dict:
+    if len(response) != 1:
+        raise ValueError("expected exactly one of PLAN, CONTINUE or OUTPUT")
+    return response
+
+class _AgentResponse(TypedDict):
+    __pydantic_config__ = ConfigDict(extra="forbid")
+
+    PLAN: NotRequired[Annotated[AgentStep, AfterValidator(_has_action)]]
+    CONTINUE: NotRequired[Annotated[AgentStep, AfterValidator(_has_action)]]
+    OUTPUT: NotRequired[AgentOutput]
+
+AgentResponse = Annotated[_AgentResponse, AfterValidator(_exactly_one)]
+
+# Built once; validate_json parses and validates in a single pass
+AGENT_RESPONSE_ADAPTER = TypeAdapter(AgentResponse)
+
+_STEP_PROPERTIES = {
+    "reasoning": {"type": "string"},
+    "tool": {
+        "type": "string",
+        "enum": [
+            "get_all_todos",
+            "search_todos",
+            "create_todos",
+            "delete_todos",
+            "delete_todos_exact",
+            "delete_todos_by_id",
+        ],
+    },
+    "args": {"type": "string"},
+    "operations": {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {"tool": {"type": "string"}, "args": {"type": "string"}},
+            "required": ["tool", "args"],
+        },
+    },
+    "expected_outcome": {"type": "string"},
+}
+
+# The same shape in the OpenAPI subset Gemini accepts as response_schema.
+# That subset cannot say "exactly one property" (no oneOf or maxProperties),
+# so a response naming several of PLAN, CONTINUE and OUTPUT gets past the
+# model and is rejected by AGENT_RESPONSE_ADAPTER instead.
+GEMINI_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "PLAN": {
+            "type": "object",
+            "properties": {
+                **_STEP_PROPERTIES,
+                "is_multi_step": {"type": "boolean"},
+                "next_step_intent": {"type": "string"},
+            },
+        },
+        "CONTINUE": {
+            "type": "object",
+            "properties": {**_STEP_PROPERTIES, "is_final_step": {"type": "boolean"}},
+        },
+        "OUTPUT": {
+            "type": "object",
+            "properties": {
+                "message": {"type": "string"},
+                "action_taken": {"type": "string"},
+            },
+            "required": ["message"],
+        },
+    },
+}
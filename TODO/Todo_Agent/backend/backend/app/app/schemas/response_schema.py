@@ -17,6 +17,15 @@ class PageBase(Page[T], Generic[T]):
     next_page: int | None = Field(None, description="Page number of the next page")
 
 
+class CursorPageBase(GenericModel, Generic[T]):
+    items: Sequence[T]
+    size: int = Field(description="Maximum number of items per page")
+    next_cursor: str | None = Field(
+        None, description="Opaque cursor of the next page, null on the last page"
+    )
+    total: int | None = Field(None, description="Total number of items, if requested")
+
+
 class IResponseBase(GenericModel, Generic[T]):
     message: str = ""
     meta: dict = {}
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 
 # Pydantic models
 class TodoRequest(BaseModel):
@@ -6,4 +7,33 @@ class TodoRequest(BaseModel):
 
 class TodoResponse(BaseModel):
     message: str
-    success: bool = True
\ No newline at end of file
+    success: bool = True
+    usage: Optional[Dict[str, int]] = None
+
+class TodoRead(BaseModel):
+    id: int
+    task: str
+
+class TodoBulkCreateRequest(BaseModel):
+    tasks: List[str] = Field(..., min_length=1)
+
+class TodoBulkDeleteRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1)
+
+class TodoBulkCreateResult(BaseModel):
+    index: int
+    created: bool
+    id: Optional[int] = None
+    task: str
+    error: Optional[str] = None
+
+class TodoBulkDeleteResult(BaseModel):
+    id: int
+    deleted: bool
+
+class TodoJob(BaseModel):
+    id: str
+    status: str
+    message: Optional[str] = None
+    error: Optional[str] = None
+    usage: Optional[Dict[str, int]] = None
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Tuple
+from fastapi import HTTPException, Request
+
+from app.core.config import settings
+from app.helpers import metrics_helper as metricsh
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Admission control in front of the LLM-backed agent endpoints.
+#
+# - Each client gets a token bucket of RATE_LIMIT_BURST requests refilled at
+#   RATE_LIMIT_PER_MINUTE; an empty bucket answers 429 with Retry-After.
+# - At most LLM_MAX_IN_FLIGHT LLM calls run at once. A new request's first
+#   call waits in a queue of at most LLM_MAX_QUEUED for at most
+#   LLM_QUEUE_TIMEOUT_SECONDS, and is shed with 503 and Retry-After when the
+#   queue is full or the wait runs out. Later calls of an admitted request
+#   wait without those limits, so work already started is not thrown away;
+#   background jobs count as admitted from their first call. Requests
+#   answered without a model call (intent router, similarity fast path,
+#   cached responses) never touch the limiter.
+#
+# Both limits are per worker process: with N workers a client can get up to
+# N times its rate, and up to N * LLM_MAX_IN_FLIGHT calls run in total.
+
+
+class OverloadedError(Exception):
+    """No LLM capacity for a new request; the client should retry after retry_after seconds."""
+
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(f"LLM capacity exhausted ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucketLimiter:
+    """Per-client token buckets, keeping the max_clients most recently seen clients."""
+
+    def __init__(self, rate_per_second: float, burst: int, max_clients: int) -> None:
+        self.rate = rate_per_second
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def acquire(self, client: str) -> float:
+        """Take a token: 0 when admitted, otherwise seconds until one is available."""
+        now = time.monotonic()
+        tokens, last = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[client] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class LLMConcurrencyLimiter:
+    """Cap on in-flight LLM calls with a bounded, time-limited wait queue."""
+
+    def __init__(self, max_in_flight: int, max_queued: int, queue_timeout: float, retry_after: int) -> None:
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.waiting = 0
+
+    async def _acquire(self, admitted: bool) -> None:
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return
+        if not admitted and self.waiting >= self.max_queued:
+            raise OverloadedError("queue_full", self.retry_after)
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), None if admitted else self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise OverloadedError("queue_timeout", self.retry_after)
+        finally:
+            self.waiting -= 1
+            metricsh.LLM_QUEUE_WAIT.observe(time.perf_counter() - start)
+
+    @asynccontextmanager
+    async def slot(self, admitted: bool = False) -> AsyncIterator[None]:
+        """Hold one of the in-flight slots; admitted requests skip the queue limits."""
+        try:
+            await self._acquire(admitted)
+        except OverloadedError as e:
+            metricsh.ADMISSION_REJECTIONS.labels(reason=e.reason).inc()
+            raise
+        metricsh.LLM_IN_FLIGHT.inc()
+        try:
+            yield
+        finally:
+            metricsh.LLM_IN_FLIGHT.dec()
+            self._semaphore.release()
+
+
+_rate_limiter: Optional[TokenBucketLimiter] = None
+_llm_limiter: Optional[LLMConcurrencyLimiter] = None
+
+
+def get_rate_limiter() -> TokenBucketLimiter:
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = TokenBucketLimiter(
+            settings.RATE_LIMIT_PER_MINUTE / 60, settings.RATE_LIMIT_BURST, settings.RATE_LIMIT_MAX_CLIENTS
+        )
+    return _rate_limiter
+
+
+def get_llm_limiter() -> LLMConcurrencyLimiter:
+    global _llm_limiter
+    if _llm_limiter is None:
+        _llm_limiter = LLMConcurrencyLimiter(
+            settings.LLM_MAX_IN_FLIGHT,
+            settings.LLM_MAX_QUEUED,
+            settings.LLM_QUEUE_TIMEOUT_SECONDS,
+            settings.ADMISSION_RETRY_AFTER_SECONDS,
+        )
+    return _llm_limiter
+
+
+def client_id(request: Request) -> str:
+    """
+    Client address; with RATE_LIMIT_TRUST_FORWARDED_FOR (only behind a proxy that
+    sets the header), the address the proxy appended to X-Forwarded-For
+    """
+    if settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.rsplit(",", 1)[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def overloaded_response(error: OverloadedError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="The assistant is at capacity, retry later",
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+def rate_limit(request: Request) -> None:
+    """FastAPI dependency answering 429 when the client's bucket is empty."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    wait = get_rate_limiter().acquire(client_id(request))
+    if wait:
+        metricsh.ADMISSION_REJECTIONS.labels(reason="rate_limited").inc()
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
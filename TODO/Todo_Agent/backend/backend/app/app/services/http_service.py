@@ -0,0 +1,61 @@
+import logging
+import httpx
+from fastapi import Request
+from app.core.config import settings
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Application-scoped HTTP clients for outbound calls (the weather upstream).
+# They are created once in main.lifespan, kept on app.state and closed on
+# shutdown, so requests reuse pooled keep-alive connections instead of paying
+# a TCP/TLS handshake per call.
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_CLIENT_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        connect=settings.HTTP_CLIENT_CONNECT_TIMEOUT,
+        read=settings.HTTP_CLIENT_READ_TIMEOUT,
+        write=settings.HTTP_CLIENT_WRITE_TIMEOUT,
+        pool=settings.HTTP_CLIENT_POOL_TIMEOUT,
+    )
+
+
+def _http2_available() -> bool:
+    if not settings.HTTP_CLIENT_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("HTTP_CLIENT_HTTP2 is set but 'h2' is not installed; using HTTP/1.1")
+        return False
+    return True
+
+
+def create_async_client() -> httpx.AsyncClient:
+    """Pooled async client with the configured limits, timeouts and HTTP/2 setting."""
+    return httpx.AsyncClient(limits=_limits(), timeout=_timeout(), http2=_http2_available())
+
+
+def create_sync_client() -> httpx.Client:
+    """Pooled sync client for code that runs in worker threads."""
+    return httpx.Client(limits=_limits(), timeout=_timeout(), http2=_http2_available())
+
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    """FastAPI dependency returning the application's async HTTP client."""
+    return request.app.state.http_client
+
+
+def get_sync_http_client(request: Request) -> httpx.Client:
+    """FastAPI dependency returning the application's sync HTTP client."""
+    return request.app.state.http_sync_client
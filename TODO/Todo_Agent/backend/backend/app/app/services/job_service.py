@@ -0,0 +1,253 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+from fastapi import Request
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, worker_count
+from app.helpers.ai_helper import TokenUsage
+from app.services.tools_service import run_todo_request
+from app.utils.uuid6 import uuid7
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Job mode for agent requests: POST enqueues the user input and returns a job
+# id at once, a bounded pool of worker tasks runs the agent and records its
+# events, and clients poll the job or follow its events.
+#
+# Jobs go through a broker. The default InProcessBroker keeps queue and job
+# records in this worker's memory, so it is only usable with a single worker:
+# a poll landing on another worker would not find the job. With
+# JOB_BROKER_URL set, RedisBroker keeps them in a local Redis standing in for
+# a real message broker, so every gunicorn worker can take jobs from the
+# queue and answer polls for them.
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED_STATUSES = (SUCCEEDED, FAILED)
+
+
+class QueueFullError(Exception):
+    """The job queue is at JOB_QUEUE_MAX_SIZE; the client should retry later."""
+
+
+def new_job(user_input: str, user_id: str) -> Dict[str, Any]:
+    return {
+        "id": str(uuid7()),
+        "status": QUEUED,
+        "user_id": user_id,
+        "user_input": user_input,
+        "message": None,
+        "error": None,
+        "usage": None,
+        "events": [],
+        "created_at": time.time(),
+        "finished_at": None,
+    }
+
+
+class InProcessBroker:
+    """asyncio.Queue plus in-memory job records, visible to this worker only."""
+
+    def __init__(self, max_size: int, result_ttl: float) -> None:
+        self._queue: asyncio.Queue[str] = asyncio.Queue(maxsize=max_size)
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._changed: Dict[str, asyncio.Event] = {}
+        self._result_ttl = result_ttl
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self._result_ttl
+        for job_id in [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and job["finished_at"] < cutoff
+        ]:
+            del self._jobs[job_id]
+            self._changed.pop(job_id, None)
+
+    async def enqueue(self, job: Dict[str, Any]) -> None:
+        self._prune()
+        try:
+            self._queue.put_nowait(job["id"])
+        except asyncio.QueueFull:
+            raise QueueFullError()
+        self._jobs[job["id"]] = job
+        self._changed[job["id"]] = asyncio.Event()
+
+    async def dequeue(self) -> Dict[str, Any]:
+        return self._jobs[await self._queue.get()]
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        self._jobs[job["id"]] = job
+        changed = self._changed.get(job["id"])
+        if changed is not None:
+            changed.set()
+            self._changed[job["id"]] = asyncio.Event()
+
+    async def wait_for_change(self, job_id: str, timeout: float) -> None:
+        changed = self._changed.get(job_id)
+        if changed is None:
+            return
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisBroker:
+    """Queue as a Redis list and job records as JSON strings, shared by all workers."""
+
+    _QUEUE_KEY = "todo-agent:jobs:queue"
+    _JOB_PREFIX = "todo-agent:jobs:"
+    _POLL_SECONDS = 0.25
+    # Bound check, job record and push in one step, so concurrent posts from
+    # several workers cannot overshoot max_size
+    _ENQUEUE_SCRIPT = """
+if redis.call('LLEN', KEYS[1]) >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+redis.call('LPUSH', KEYS[1], ARGV[4])
+return 1
+"""
+
+    def __init__(self, url: str, max_size: int, result_ttl: float) -> None:
+        import redis.asyncio as redis  # optional dependency
+
+        self._redis = redis.from_url(url, decode_responses=True)
+        self._enqueue = self._redis.register_script(self._ENQUEUE_SCRIPT)
+        self._max_size = max_size
+        self._result_ttl = int(result_ttl)
+
+    async def enqueue(self, job: Dict[str, Any]) -> None:
+        queued = await self._enqueue(
+            keys=[self._QUEUE_KEY, self._JOB_PREFIX + job["id"]],
+            args=[self._max_size, json.dumps(job, default=str), self._result_ttl, job["id"]],
+        )
+        if not queued:
+            raise QueueFullError()
+
+    async def dequeue(self) -> Dict[str, Any]:
+        while True:
+            # Without a timeout brpop blocks until a job is pushed and never returns None
+            popped = await self._redis.brpop([self._QUEUE_KEY])
+            if popped is None:
+                continue
+            job = await self.get(str(popped[1]))
+            if job is not None:
+                return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        payload = await self._redis.get(self._JOB_PREFIX + job_id)
+        return json.loads(payload) if payload is not None else None
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        await self._redis.set(self._JOB_PREFIX + job["id"], json.dumps(job, default=str), ex=self._result_ttl)
+
+    async def wait_for_change(self, job_id: str, timeout: float) -> None:
+        await asyncio.sleep(min(timeout, self._POLL_SECONDS))
+
+    async def depth(self) -> int:
+        return await self._redis.llen(self._QUEUE_KEY)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def create_broker():
+    """Broker selected by JOB_BROKER_URL; refuses the in-process one with several workers."""
+    if settings.JOB_BROKER_URL:
+        return RedisBroker(settings.JOB_BROKER_URL, settings.JOB_QUEUE_MAX_SIZE, settings.JOB_RESULT_TTL_SECONDS)
+    workers = worker_count()
+    if workers > 1:
+        raise RuntimeError(
+            f"{workers} workers need a shared job broker: set JOB_BROKER_URL, "
+            f"otherwise job polls that reach another worker answer 404"
+        )
+    return InProcessBroker(settings.JOB_QUEUE_MAX_SIZE, settings.JOB_RESULT_TTL_SECONDS)
+
+
+class JobWorkerPool:
+    """JOB_WORKERS tasks taking jobs from the broker and running the agent on them."""
+
+    def __init__(self, broker, workers: int) -> None:
+        self.broker = broker
+        self.workers = workers
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._work(index)) for index in range(self.workers)]
+        logger.info(f"Started {self.workers} job workers")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.broker.close()
+
+    async def _work(self, index: int) -> None:
+        while True:
+            try:
+                job = await self.broker.dequeue()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {index} failed to take a job: {e}")
+                await asyncio.sleep(1)
+                continue
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # A broker error while recording the job must not end this worker
+                logger.error(f"Job worker {index} failed to record job {job['id']}: {e}")
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job["status"] = RUNNING
+        await self.broker.save(job)
+        usage = TokenUsage()
+        try:
+            await asyncio.wait_for(self._run_agent(job, usage), settings.JOB_TIMEOUT_SECONDS)
+            job["status"] = SUCCEEDED
+        except asyncio.TimeoutError:
+            job["status"] = FAILED
+            job["error"] = f"Job exceeded {settings.JOB_TIMEOUT_SECONDS} seconds"
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {e}")
+            job["status"] = FAILED
+            job["error"] = str(e)
+        job["usage"] = usage.to_dict()
+        job["finished_at"] = time.time()
+        await self.broker.save(job)
+
+    async def _run_agent(self, job: Dict[str, Any], usage: TokenUsage) -> None:
+        async with AsyncSessionLocal() as db:
+            # The job already waited its turn in the queue, so its LLM calls
+            # wait for a slot instead of being shed
+            async for event in run_todo_request(
+                job["user_input"], db, job["user_id"], usage, admitted=True
+            ):
+                job["events"].append(event)
+                if event["event"] == "output":
+                    job["message"] = event["data"]["message"]
+                await self.broker.save(job)
+
+
+def get_job_broker(request: Request):
+    """FastAPI dependency returning the broker of the application's job pool."""
+    return request.app.state.job_pool.broker
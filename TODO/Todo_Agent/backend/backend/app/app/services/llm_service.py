@@ -0,0 +1,359 @@
+import abc
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Set
+
+from app.core.config import settings
+from app.helpers import cache_helper as cacheh
+from app.helpers import metrics_helper as metricsh
+from app.helpers import prompt_helper as prompth
+from app.schemas.agent import GEMINI_RESPONSE_SCHEMA
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Model backends behind ai_helper.call_llm / stream_llm. LLM_PROVIDER selects
+# one of:
+#   "gemini"     GeminiProvider for LLM_MODEL
+#   "scripted"   ScriptedProvider replaying LLM_SCRIPT_PATH, for tests,
+#                benchmarks and load tests without the real API
+#   "composite"  CompositeProvider over LLM_COMPOSITE_PROVIDERS, tried in
+#                order with hedging after LLM_HEDGE_AFTER_SECONDS
+# Each provider gets LLM_PROVIDER_BUDGETS_SECONDS[name] (or the default
+# budget) to answer, where name is "gemini:<model>" or "scripted".
+# LLM_RECORD_PATH records every answer of the selected provider so it can be
+# replayed by the scripted provider later.
+#
+# Provider SDKs are imported on first use, so importing the app stays cheap
+# and a scripted deployment never loads them. get_provider() keeps one
+# provider per worker process; main.lifespan builds it (and opens its
+# channel) after the fork, during the warm-up.
+
+
+class ProviderError(Exception):
+    """No provider produced an answer."""
+
+
+@dataclass
+class LLMResult:
+    """Text produced by a provider (a whole answer or one streamed chunk)."""
+
+    text: str
+    usage_metadata: Any = None
+    provider: str = ""
+
+
+@functools.lru_cache(maxsize=None)
+def _genai():
+    """google.generativeai, imported and configured once per process."""
+    import google.generativeai as genai  # slow to import, so only when used
+
+    genai.configure(api_key=settings.GEMINI_API_KEY)
+    return genai
+
+
+class LLMProvider(abc.ABC):
+    """Interface of a model backend."""
+
+    name: str = "provider"
+
+    # Optional hook, so deliberately not abstract: providers without SDKs or
+    # connections to prepare keep this no-op
+    async def warm_up(self) -> None:  # noqa: B027
+        """Load SDKs and open connections before the first request needs them."""
+
+    @abc.abstractmethod
+    async def generate(self, contents: str | List[Dict]) -> LLMResult:
+        """Whole answer to a prompt or conversation."""
+
+    async def stream(self, contents: str | List[Dict]) -> AsyncIterator[LLMResult]:
+        """Answer in chunks; providers without a streaming API send one chunk."""
+        yield await self.generate(contents)
+
+
+def contents_digest(contents: str | List[Dict]) -> str:
+    """Stable key of a prompt or conversation, used by recordings."""
+    return hashlib.sha256(cacheh.normalize_prompt(contents).encode("utf-8")).hexdigest()
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini through google-generativeai, with SYSTEM_PROMPT as system instruction."""
+
+    def __init__(self, model_name: str) -> None:
+        self.name = f"gemini:{model_name}"
+        generation_config = None
+        if settings.LLM_JSON_MODE:
+            # Native JSON mode: the model can only answer with the agent schema
+            generation_config = {
+                "response_mime_type": "application/json",
+                "response_schema": GEMINI_RESPONSE_SCHEMA,
+            }
+        self.model = _genai().GenerativeModel(
+            model_name=model_name,
+            system_instruction=prompth.SYSTEM_PROMPT,
+            generation_config=generation_config,
+        )
+
+    async def warm_up(self) -> None:
+        # The SDK shares one default async client (and its gRPC channel) per
+        # process; creating it here spares the first request the setup
+        from google.generativeai import client
+
+        client.get_default_generative_async_client()
+
+    async def generate(self, contents: str | List[Dict]) -> LLMResult:
+        response = await self.model.generate_content_async(contents)
+        return LLMResult(response.text, getattr(response, "usage_metadata", None), self.name)
+
+    async def stream(self, contents: str | List[Dict]) -> AsyncIterator[LLMResult]:
+        response = await self.model.generate_content_async(contents, stream=True)
+        async for chunk in response:
+            yield LLMResult(chunk.text, getattr(chunk, "usage_metadata", None), self.name)
+
+
+class ScriptedProvider(LLMProvider):
+    """
+    Deterministic local provider. Recorded prompts are answered with their
+    recorded response; anything else gets the scripted response for its turn
+    (the step number of an agent step prompt, or the number of model turns in
+    a conversation), so concurrent requests each walk the script from the
+    start.
+    """
+
+    def __init__(
+        self,
+        script: Sequence[str | Dict] = (),
+        recordings: Optional[Dict[str, str]] = None,
+        latency: float = 0.0,
+        name: str = "scripted",
+    ) -> None:
+        self.name = name
+        self.script = [entry if isinstance(entry, str) else json.dumps(entry) for entry in script]
+        self.recordings = recordings or {}
+        self.latency = latency
+        self.calls = 0
+
+    @classmethod
+    def from_file(cls, path: str, latency: float = 0.0) -> "ScriptedProvider":
+        """
+        Load a JSONL file of {"script": response} and/or {"digest", "response"}
+        lines, as written by RecordingProvider.
+        """
+        script, recordings = [], {}
+        for line in Path(path).read_text().splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "digest" in entry:
+                recordings[entry["digest"]] = entry["response"]
+            else:
+                script.append(entry["script"])
+        return cls(script, recordings, latency)
+
+    def reply_for(self, contents: str | List[Dict]) -> LLMResult:
+        self.calls += 1
+        recorded = self.recordings.get(contents_digest(contents))
+        if recorded is not None:
+            return LLMResult(recorded, None, self.name)
+        if not self.script:
+            raise ProviderError("Scripted provider has no response for this prompt")
+        if isinstance(contents, list):
+            turn = sum(1 for entry in contents if entry.get("role") == "model")
+        else:
+            turn = prompth.step_number(contents) - 1
+        return LLMResult(self.script[min(turn, len(self.script) - 1)], None, self.name)
+
+    async def generate(self, contents: str | List[Dict]) -> LLMResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.reply_for(contents)
+
+
+class RecordingProvider(LLMProvider):
+    """Wraps a provider and appends every answer to a JSONL file for ScriptedProvider."""
+
+    def __init__(self, inner: LLMProvider, path: str) -> None:
+        self.inner = inner
+        self.name = inner.name
+        self.path = Path(path)
+
+    async def warm_up(self) -> None:
+        await self.inner.warm_up()
+
+    def _record(self, contents: str | List[Dict], text: str) -> None:
+        with self.path.open("a") as recording:
+            recording.write(json.dumps({"digest": contents_digest(contents), "response": text}) + "\n")
+
+    async def generate(self, contents: str | List[Dict]) -> LLMResult:
+        result = await self.inner.generate(contents)
+        self._record(contents, result.text)
+        return result
+
+    async def stream(self, contents: str | List[Dict]) -> AsyncIterator[LLMResult]:
+        chunks = []
+        async for chunk in self.inner.stream(contents):
+            chunks.append(chunk.text)
+            yield chunk
+        self._record(contents, "".join(chunks))
+
+
+class CompositeProvider(LLMProvider):
+    """
+    Ordered providers with per-provider latency budgets. A provider that fails
+    or runs out of budget falls back to the next one. With hedge_after set,
+    a provider still running after that many seconds gets the next provider
+    started alongside it (at most max_in_flight at once) and the first answer
+    wins.
+    """
+
+    def __init__(
+        self,
+        providers: Sequence[LLMProvider],
+        budgets: Optional[Dict[str, float]] = None,
+        default_budget: Optional[float] = None,
+        hedge_after: Optional[float] = None,
+        max_in_flight: int = 2,
+    ) -> None:
+        if not providers:
+            raise ValueError("CompositeProvider needs at least one provider")
+        self.providers = list(providers)
+        if len(self.providers) == 1:
+            self.name = self.providers[0].name
+        else:
+            self.name = "composite(" + ",".join(p.name for p in self.providers) + ")"
+        self.budgets = budgets or {}
+        self.default_budget = default_budget
+        self.hedge_after = hedge_after
+        self.max_in_flight = max_in_flight
+
+    async def warm_up(self) -> None:
+        await asyncio.gather(*(provider.warm_up() for provider in self.providers))
+
+    def _budget(self, provider: LLMProvider) -> Optional[float]:
+        return self.budgets.get(provider.name, self.default_budget)
+
+    async def _attempt(self, provider: LLMProvider, contents: str | List[Dict]) -> LLMResult:
+        try:
+            return await asyncio.wait_for(provider.generate(contents), self._budget(provider))
+        except asyncio.TimeoutError:
+            metricsh.LLM_PROVIDER_EVENTS.labels(provider=provider.name, event="budget_exceeded").inc()
+            raise ProviderError(f"{provider.name} exceeded its {self._budget(provider)}s budget")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            metricsh.LLM_PROVIDER_EVENTS.labels(provider=provider.name, event="error").inc()
+            raise ProviderError(f"{provider.name}: {e}")
+
+    async def generate(self, contents: str | List[Dict]) -> LLMResult:
+        loop = asyncio.get_running_loop()
+        remaining = list(self.providers)
+        in_flight: Set[asyncio.Task] = set()
+        hedge_at: Dict[asyncio.Task, float] = {}
+        errors = []
+
+        def launch(event: Optional[str]) -> None:
+            provider = remaining.pop(0)
+            if event is not None:
+                metricsh.LLM_PROVIDER_EVENTS.labels(provider=provider.name, event=event).inc()
+            task = asyncio.ensure_future(self._attempt(provider, contents))
+            in_flight.add(task)
+            if self.hedge_after is not None:
+                hedge_at[task] = loop.time() + self.hedge_after
+
+        launch(None)
+        try:
+            while in_flight:
+                can_hedge = remaining and len(in_flight) < self.max_in_flight and hedge_at
+                timeout = max(min(hedge_at.values()) - loop.time(), 0) if can_hedge else None
+                done, _ = await asyncio.wait(in_flight, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # The oldest attempt is slow: race the next provider against it
+                    hedge_at.pop(min(hedge_at, key=hedge_at.get))
+                    launch("hedge")
+                    continue
+                for task in done:
+                    in_flight.discard(task)
+                    hedge_at.pop(task, None)
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(str(task.exception()))
+                if not in_flight and remaining:
+                    launch("fallback")
+        finally:
+            for task in in_flight:
+                task.cancel()
+        raise ProviderError("All providers failed: " + "; ".join(errors))
+
+    async def stream(self, contents: str | List[Dict]) -> AsyncIterator[LLMResult]:
+        """Ordered fallback only: the budget bounds the wait for the first chunk."""
+        errors = []
+        for index, provider in enumerate(self.providers):
+            if index:
+                metricsh.LLM_PROVIDER_EVENTS.labels(provider=provider.name, event="fallback").inc()
+            chunks = provider.stream(contents)
+            try:
+                first = await asyncio.wait_for(chunks.__anext__(), self._budget(provider))
+            except StopAsyncIteration:
+                return
+            except Exception as e:
+                event = "budget_exceeded" if isinstance(e, asyncio.TimeoutError) else "error"
+                metricsh.LLM_PROVIDER_EVENTS.labels(provider=provider.name, event=event).inc()
+                await chunks.aclose()
+                errors.append(f"{provider.name}: {e or type(e).__name__}")
+                continue
+            yield first
+            # Once chunks were sent the answer cannot switch providers
+            async for chunk in chunks:
+                yield chunk
+            return
+        raise ProviderError("All providers failed: " + "; ".join(errors))
+
+
+def _provider_from_spec(spec: str) -> LLMProvider:
+    kind, _, argument = spec.partition(":")
+    if kind == "gemini":
+        return GeminiProvider(argument or settings.LLM_MODEL)
+    if kind == "scripted":
+        path = argument or settings.LLM_SCRIPT_PATH
+        if not path:
+            raise ValueError("The scripted provider needs LLM_SCRIPT_PATH or 'scripted:<path>'")
+        return ScriptedProvider.from_file(path)
+    raise ValueError(f"Unknown LLM provider '{spec}'")
+
+
+def create_provider() -> LLMProvider:
+    """Provider selected by LLM_PROVIDER."""
+    if settings.LLM_PROVIDER == "composite":
+        provider: LLMProvider = CompositeProvider(
+            [_provider_from_spec(spec) for spec in settings.LLM_COMPOSITE_PROVIDERS],
+            budgets=settings.LLM_PROVIDER_BUDGETS_SECONDS,
+            default_budget=settings.LLM_PROVIDER_DEFAULT_BUDGET_SECONDS,
+            hedge_after=settings.LLM_HEDGE_AFTER_SECONDS,
+        )
+    else:
+        # A composite of one still enforces the provider's latency budget
+        provider = CompositeProvider(
+            [_provider_from_spec(settings.LLM_PROVIDER)],
+            budgets=settings.LLM_PROVIDER_BUDGETS_SECONDS,
+            default_budget=settings.LLM_PROVIDER_DEFAULT_BUDGET_SECONDS,
+        )
+    if settings.LLM_RECORD_PATH:
+        provider = RecordingProvider(provider, settings.LLM_RECORD_PATH)
+    return provider
+
+
+_provider: Optional[LLMProvider] = None
+
+
+def get_provider() -> LLMProvider:
+    """This worker's provider, created on first use and then reused by every request."""
+    global _provider
+    if _provider is None:
+        _provider = create_provider()
+    return _provider
@@ -0,0 +1,75 @@
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.helpers import cache_helper as cacheh
+from app.models.todo import Todos
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TodoRow = Tuple[int, str]
+
+# Process-wide read-through copies of the todo lists of the
+# TODO_SNAPSHOT_MAX_USERS most recently active users, each tagged with the
+# user's todo-state version it was read at. Any Todos write of the user bumps
+# the version, which makes their copy miss on the next read. Only enable
+# TODO_SNAPSHOT_SHARED_CACHE with several workers when LLM_CACHE_REDIS_URL
+# shares the versions between them.
+_shared_snapshots: "OrderedDict[str, Tuple[int, Tuple[TodoRow, ...]]]" = OrderedDict()
+
+
+async def load_todo_rows(db: AsyncSession, user_id: str) -> Tuple[TodoRow, ...]:
+    """Read (id, task) for every todo of the user, through the process-wide cache when enabled."""
+    if not settings.TODO_SNAPSHOT_SHARED_CACHE:
+        return tuple((todo.id, todo.todo_task) for todo in await Todos.get_all_todos(db, user_id))
+
+    # Read the version before querying: a write racing with the query can
+    # only make the stored copy newer than its tag, never older.
+    version = await cacheh.get_todos_version(user_id)
+    cached = _shared_snapshots.get(user_id)
+    if cached is not None and cached[0] == version:
+        _shared_snapshots.move_to_end(user_id)
+        return cached[1]
+    rows = tuple((todo.id, todo.todo_task) for todo in await Todos.get_all_todos(db, user_id))
+    _shared_snapshots[user_id] = (version, rows)
+    _shared_snapshots.move_to_end(user_id)
+    while len(_shared_snapshots) > settings.TODO_SNAPSHOT_MAX_USERS:
+        _shared_snapshots.popitem(last=False)
+    return rows
+
+
+class TodoSnapshot:
+    """
+    Request-scoped unit of work over the caller's todo list. The first read
+    loads it, later reads in the same agent run are served from memory, and
+    the run's own creates and deletes patch it in place.
+    """
+
+    def __init__(self, user_id: str) -> None:
+        self.user_id = user_id
+        self._rows: Optional[Dict[int, str]] = None
+        self.loads = 0
+        self.hits = 0
+
+    async def get_rows(self, db: AsyncSession) -> List[TodoRow]:
+        if self._rows is None:
+            self._rows = dict(await load_todo_rows(db, self.user_id))
+            self.loads += 1
+        else:
+            self.hits += 1
+        return list(self._rows.items())
+
+    def record_create(self, todo_id: int, task: str) -> None:
+        if self._rows is not None:
+            self._rows[todo_id] = task
+
+    def record_delete(self, todo_id: int) -> None:
+        if self._rows is not None:
+            self._rows.pop(todo_id, None)
+
+    def invalidate(self) -> None:
+        """Forget the loaded rows, e.g. after a rolled back batch."""
+        self._rows = None
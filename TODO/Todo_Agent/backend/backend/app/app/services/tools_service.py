@@ -1,29 +1,90 @@
 import logging
 from app.helpers import prompt_helper as prompth
 from app.helpers import ai_helper as aih
-from sqlalchemy.orm import Session
-from typing import Any, Tuple
+from app.helpers import intent_helper as intenth
+from app.core.config import settings
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from app.models.todo import Todos
+from app.helpers import cache_helper as cacheh
+from app.helpers import compaction_helper as compacth
+from app.helpers import similarity_helper as similh
+from app.helpers import metrics_helper as metricsh
+from app.services.admission_service import OverloadedError
+from app.services.snapshot_service import TodoSnapshot, load_todo_rows
+from app.db.session import worker_count
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def execute_database_operation(tool: str, args: Any, db: Session) -> Tuple[bool, str]:
-    """Execute database operation and return result."""
+async def _record_write(
+    user_id: str,
+    snapshot: Optional[TodoSnapshot],
+    commit: bool,
+    created: Optional[Tuple[int, str]] = None,
+    deleted: Optional[int] = None,
+) -> None:
+    """Patch the request snapshot and the similarity index after a successful write."""
+    if created is not None:
+        if snapshot is not None:
+            snapshot.record_create(*created)
+        similh.record_create(user_id, *created)
+    if deleted is not None:
+        if snapshot is not None:
+            snapshot.record_delete(deleted)
+        similh.record_delete(user_id, deleted)
+    if commit:
+        await similh.sync_after_local_write(user_id)
+
+async def execute_database_operation(
+    tool: str,
+    args: Any,
+    db: AsyncSession,
+    user_id: str,
+    commit: bool = True,
+    snapshot: Optional[TodoSnapshot] = None,
+    user_input: str = "",
+) -> Tuple[bool, str]:
+    """Execute database operation on the user's todos and return result."""
+    success, result = await _run_tool(tool, args, db, user_id, commit, snapshot, user_input)
+    metricsh.TOOL_CALLS.labels(
+        tool=metricsh.tool_label(tool), outcome="success" if success else "failure"
+    ).inc()
+    return success, result
+
+async def _run_tool(
+    tool: str,
+    args: Any,
+    db: AsyncSession,
+    user_id: str,
+    commit: bool,
+    snapshot: Optional[TodoSnapshot],
+    user_input: str,
+) -> Tuple[bool, str]:
     try:
         if tool == "get_all_todos":
-            todos = Todos.get_all_todos(db)
-            if not todos:
+            rows = await snapshot.get_rows(db) if snapshot is not None else await load_todo_rows(db, user_id)
+            if not rows:
                 return True, "No todos found"
-            todo_list = [f"ID: {todo.id} - Task: '{todo.todo_task}'" for todo in todos]
-            return True, f"Current todos: {todo_list}"
+            table = compacth.compact_todos(rows, user_input, settings.TOOL_RESULT_TOKEN_BUDGET)
+            return True, f"Current todos ({len(rows)}):\n{table}"
+        
+        elif tool == "search_todos" and args:
+            matches = await Todos.search_todos(db, user_id, str(args))
+            if not matches:
+                return True, f"No todos match '{args}'"
+            candidates = "\n".join(
+                f"{todo.id}|{todo.todo_task}|{score:.2f}" for todo, score in matches
+            )
+            return True, f"Best matches for '{args}':\nid|task|score\n{candidates}"
         
         elif tool == "create_todos" and args:
             try:
-                todo_id = Todos.create_todos(db=db, task=str(args))
+                todo_id = await Todos.create_todos(db=db, user_id=user_id, task=str(args), commit=commit)
                 if todo_id:
+                    await _record_write(user_id, snapshot, commit, created=(todo_id, str(args)))
                     return True, f"Successfully created todo: '{args}' (ID: {todo_id})"
                 else:
                     return False, f"Failed to create todo: '{args}'"
@@ -32,8 +93,20 @@ def execute_database_operation(tool: str, args: Any, db: Session) -> Tuple[bool,
         
         elif tool == "delete_todos" and args:
             try:
-                deleted = Todos.delete_todos(db=db, task=str(args))
+                deleted = await Todos.delete_todos(db=db, user_id=user_id, task=str(args), commit=commit)
+                if deleted:
+                    await _record_write(user_id, snapshot, commit, deleted=deleted)
+                    return True, f"Successfully deleted todo: '{args}'"
+                else:
+                    return False, f"Todo '{args}' not found - nothing was deleted"
+            except Exception as e:
+                return False, f"Failed to delete todo '{args}': {str(e)}"
+        
+        elif tool == "delete_todos_exact" and args:
+            try:
+                deleted = await Todos.delete_todos_exact(db=db, user_id=user_id, task=str(args), commit=commit)
                 if deleted:
+                    await _record_write(user_id, snapshot, commit, deleted=deleted)
                     return True, f"Successfully deleted todo: '{args}'"
                 else:
                     return False, f"Todo '{args}' not found - nothing was deleted"
@@ -45,8 +118,9 @@ def execute_database_operation(tool: str, args: Any, db: Session) -> Tuple[bool,
                 if isinstance(args, list):
                     args = args[0]
                 task_id = int(args)
-                deleted = Todos.delete_todos_by_id(db=db, task_id=task_id)
+                deleted = await Todos.delete_todos_by_id(db=db, user_id=user_id, task_id=task_id, commit=commit)
                 if deleted:
+                    await _record_write(user_id, snapshot, commit, deleted=task_id)
                     return True, f"Successfully deleted todo with ID: {task_id}"
                 else:
                     return False, f"Todo with ID {task_id} not found - nothing was deleted"
@@ -61,105 +135,275 @@ def execute_database_operation(tool: str, args: Any, db: Session) -> Tuple[bool,
     except Exception as e:
         logger.error(f"Error executing tool {tool}: {e}")
         return False, f"Error executing {tool}: {str(e)}"
-    
-def process_todo_request(user_input: str, db: Session) -> str:
-    """Process todo request using functional approach."""
-    client = aih.create_gemini_client()
+
+async def execute_database_operations(
+    operations: List[Dict],
+    db: AsyncSession,
+    user_id: str,
+    snapshot: Optional[TodoSnapshot] = None,
+    user_input: str = "",
+) -> Tuple[bool, str]:
+    """Execute a list of operations in one transaction and report each result."""
+    if not isinstance(operations, list):
+        return False, "Invalid operations: expected a list of {tool, args} objects"
+    if len(operations) > settings.AGENT_MAX_BATCH_OPERATIONS:
+        return False, (
+            f"Too many operations ({len(operations)}); "
+            f"at most {settings.AGENT_MAX_BATCH_OPERATIONS} are allowed per step"
+        )
+
+    results = []
+    all_succeeded = True
+    try:
+        for index, operation in enumerate(operations, start=1):
+            if not isinstance(operation, dict):
+                success, message = False, f"Invalid operation: {operation}"
+            else:
+                tool, args = operation.get("tool"), operation.get("args")
+                success, message = await execute_database_operation(
+                    tool, args, db, user_id, commit=False, snapshot=snapshot, user_input=user_input
+                )
+            all_succeeded = all_succeeded and success
+            results.append(f"{index}. {'OK' if success else 'FAILED'}: {message}")
+        await db.commit()
+        await cacheh.bump_todos_version(user_id)
+        await similh.sync_after_local_write(user_id)
+    except Exception as e:
+        await db.rollback()
+        if snapshot is not None:
+            snapshot.invalidate()
+        similh.invalidate(user_id)
+        logger.error(f"Batch of {len(operations)} operations rolled back: {e}")
+        return False, f"All {len(operations)} operations were rolled back, nothing was changed: {str(e)}"
+
+    return all_succeeded, f"Executed {len(operations)} operations:\n" + "\n".join(results)
+
+async def execute_step(
+    step_data: Dict,
+    db: AsyncSession,
+    user_id: str,
+    snapshot: Optional[TodoSnapshot] = None,
+    user_input: str = "",
+) -> Tuple[str, Any, bool, str]:
+    """Execute the single operation or the operation list of a PLAN/CONTINUE step."""
+    operations = step_data.get("operations")
+    if operations:
+        success, tool_result = await execute_database_operations(operations, db, user_id, snapshot, user_input)
+        return "operations", operations, success, tool_result
+    tool = step_data.get("tool")
+    args = step_data.get("args")
+    success, tool_result = await execute_database_operation(
+        tool, args, db, user_id, snapshot=snapshot, user_input=user_input
+    )
+    return tool, args, success, tool_result
+
+async def release_connection(db: AsyncSession) -> None:
+    """Return the pooled connection between steps so it is not held across LLM calls."""
+    await db.close()
+
+async def process_todo_request(
+    user_input: str, db: AsyncSession, user_id: str, usage: Optional[aih.TokenUsage] = None
+) -> str:
+    """Process a user's todo request using functional approach."""
+    message = "Operation completed."
+    async for event in run_todo_request(user_input, db, user_id, usage):
+        if event["event"] == "output":
+            message = event["data"]["message"]
+    return message
+
+def _direct_delete_allowed() -> bool:
+    """
+    Whether a decisive similarity match may be deleted without the LLM. The
+    index is tagged with the user's todo version, which without Redis is a
+    per-worker counter that never sees other workers' writes.
+    """
+    if not settings.SIMILARITY_DIRECT_DELETE:
+        return False
+    return cacheh.versions_shared() or worker_count() == 1
+
+def _list_message(rows: List[Tuple[int, str]]) -> str:
+    """User-facing answer to a list command; long lists show the newest page."""
+    if not rows:
+        return "You have no todos."
+    shown = sorted(rows)[-settings.TODO_PAGE_DEFAULT_SIZE:]
+    lines = "\n".join(f"- {task} (ID: {todo_id})" for todo_id, task in shown)
+    message = f"You have {len(rows)} todo{'s' if len(rows) != 1 else ''}:\n{lines}"
+    if len(rows) > len(shown):
+        message += f"\n...and {len(rows) - len(shown)} older ones, see your todo list for all of them."
+    return message
+
+def _output(message: str) -> Dict:
+    return {"event": "output", "data": {"message": message}}
+
+def _tool_result(tool: str, args: Any, success: bool, result: str) -> Dict:
+    return {
+        "event": "tool_result",
+        "data": {"tool": tool, "args": args, "success": success, "result": result},
+    }
+
+async def run_todo_request(
+    user_input: str,
+    db: AsyncSession,
+    user_id: str,
+    usage: Optional[aih.TokenUsage] = None,
+    stream_output: bool = False,
+    admitted: bool = False,
+) -> AsyncIterator[Dict]:
+    """
+    Run the agent loop, yielding progress events as they happen: "plan" and
+    "continue" steps, each "tool_result", "token" pieces of the final message
+    (only with stream_output) and exactly one closing "output" event. Tools
+    only see and change the todos of user_id. Raises OverloadedError when the
+    first LLM call finds no capacity, unless the request is already admitted
+    (a job that waited in the job queue).
+    """
+    # Fast path: unambiguous commands skip the LLM entirely
+    if settings.INTENT_ROUTER_ENABLED:
+        intent = intenth.route_intent(user_input)
+        if intent is not None:
+            tool, args = intent
+            snapshot = TodoSnapshot(user_id)
+            success, tool_result = await execute_database_operation(
+                tool, args, db, user_id, snapshot=snapshot, user_input=user_input
+            )
+            logger.info(f"Fast path handled '{tool}' (success={success})")
+            metricsh.AGENT_REQUESTS.labels(path="intent_router").inc()
+            yield _tool_result(tool, args, success, tool_result)
+            # The tool result is written for the LLM; answer the user in prose
+            if tool == "get_all_todos" and success:
+                yield _output(_list_message(await snapshot.get_rows(db)))
+            else:
+                yield _output(tool_result)
+            return
+
+    # Todo list shared by every iteration of this request
+    snapshot = TodoSnapshot(user_id)
+
+    # Vague reference to one existing todo: look it up locally and hand the
+    # LLM only the top candidates. An explicit delete command whose best
+    # candidate clearly wins is carried out directly, but only where the
+    # index's todo version is the one every worker sees.
+    context: Optional[Dict[str, Any]] = None
+    command = intenth.extract_delete_command(user_input) if settings.SIMILARITY_INDEX_ENABLED else None
+    reference = command or (intenth.extract_reference(user_input) if settings.SIMILARITY_INDEX_ENABLED else None)
+    if reference:
+        candidates = await similh.top_k(db, user_id, reference, settings.SIMILARITY_TOP_K)
+        candidates = [c for c in candidates if c[2] >= settings.SIMILARITY_MIN_SCORE]
+        if command and _direct_delete_allowed() and similh.is_decisive(
+            candidates, settings.SIMILARITY_DECISIVE_SCORE, settings.SIMILARITY_DECISIVE_MARGIN
+        ):
+            todo_id, task, score = candidates[0]
+            success, tool_result = await execute_database_operation(
+                "delete_todos_by_id", todo_id, db, user_id, snapshot=snapshot
+            )
+            if success:
+                logger.info(f"Similarity match resolved to todo {todo_id} ({score:.2f})")
+                metricsh.AGENT_REQUESTS.labels(path="similarity").inc()
+                yield _tool_result("delete_todos_by_id", todo_id, success, tool_result)
+                yield _output(f"Done! I removed '{task}' (ID: {todo_id}) from your todos.")
+                return
+        if candidates:
+            context = {
+                "type": "candidates",
+                "candidates": "\n".join(f"{c[0]}|{c[1]}|{c[2]:.2f}" for c in candidates),
+            }
+        await release_connection(db)
+
+    client = aih.get_llm_provider()
     max_iterations = 5
     iteration_count = 0
+    # One-line summaries of the executed steps; only the latest step's result
+    # is sent in full (see prompt_helper.build_step_prompt)
+    steps: List[str] = []
     
-    # Start with initial planning
-    current_prompt = prompth.build_prompt(prompth.SYSTEM_PROMPT, user_input)
-    
-    while iteration_count < max_iterations:
-        iteration_count += 1
+    metricsh.AGENT_REQUESTS.labels(path="llm").inc()
+    try:
+        while iteration_count < max_iterations:
+            iteration_count += 1
+            prompt = prompth.build_step_prompt(
+                user_input, context, steps[:-1], iteration_count, max_iterations
+            )
         
-        try:
-            # Get LLM response
-            parsed_response = aih.call_llm(current_prompt, client)
+            try:
+                # Get LLM response; after the first call the request holds its admission
+                admitted = admitted or iteration_count > 1
+                if stream_output:
+                    parsed_response = {}
+                    async for piece in aih.stream_llm(prompt, client, user_id, usage, admitted):
+                        if "token" in piece:
+                            yield {"event": "token", "data": {"text": piece["token"]}}
+                        else:
+                            parsed_response = piece["response"]
+                else:
+                    parsed_response = await aih.call_llm(prompt, client, user_id, usage, admitted)
             
-            if "error" in parsed_response:
-                return f"Error processing request: {parsed_response['error']}"
+                if "error" in parsed_response:
+                    yield _output(f"Error processing request: {parsed_response['error']}")
+                    return
             
-            # Handle PLAN response
-            if "PLAN" in parsed_response:
-                plan_data = parsed_response["PLAN"]
-                tool = plan_data.get("tool")
-                args = plan_data.get("args")
+                # Handle PLAN response
+                if "PLAN" in parsed_response:
+                    plan_data = parsed_response["PLAN"]
+                    yield {"event": "plan", "data": plan_data}
                 
-                # Execute the planned operation
-                success, tool_result = execute_database_operation(tool, args, db)
+                    # Execute the planned operation(s)
+                    tool, args, success, tool_result = await execute_step(plan_data, db, user_id, snapshot, user_input)
+                    await release_connection(db)
+                    yield _tool_result(tool, args, success, tool_result)
+                    steps.append(prompth.step_summary(tool, args, success, tool_result))
                 
-                # Check if this is a multi-step operation
-                is_multi_step = plan_data.get("is_multi_step", False)
-                
-                if is_multi_step and success:
-                    # Prepare for next step
+                    # A successful multi-step operation continues, anything
+                    # else (single step or failed) goes to the output
+                    is_multi_step = plan_data.get("is_multi_step", False)
                     context = {
-                        "type": "continue",
+                        "type": "continue" if is_multi_step and success else "output",
                         "tool": tool,
                         "args": args,
                         "success": success,
                         "result": tool_result
                     }
-                    current_prompt = prompth.build_prompt(prompth.SYSTEM_PROMPT, user_input, context)
-                    continue
-                else:
-                    # Single step operation or failed multi-step - provide output
-                    context = {
-                        "type": "output",
-                        "plan": plan_data,
-                        "success": success,
-                        "result": tool_result
-                    }
-                    current_prompt = prompth.build_prompt(prompth.SYSTEM_PROMPT, user_input, context)
                     continue
             
-            # Handle CONTINUE response 
-            elif "CONTINUE" in parsed_response:
-                continue_data = parsed_response["CONTINUE"]
-                tool = continue_data.get("tool")
-                args = continue_data.get("args")
-                
-                # Execute the continued operation
-                success, tool_result = execute_database_operation(tool, args, db)
+                # Handle CONTINUE response 
+                elif "CONTINUE" in parsed_response:
+                    continue_data = parsed_response["CONTINUE"]
+                    yield {"event": "continue", "data": continue_data}
                 
-                # Check if this is the final step
-                is_final_step = continue_data.get("is_final_step", True)
+                    # Execute the continued operation(s)
+                    tool, args, success, tool_result = await execute_step(continue_data, db, user_id, snapshot, user_input)
+                    await release_connection(db)
+                    yield _tool_result(tool, args, success, tool_result)
+                    steps.append(prompth.step_summary(tool, args, success, tool_result))
                 
-                if is_final_step or not success:
-                    # Final step or failed operation - provide output
+                    # Final step or failed operation goes to the output,
+                    # otherwise more steps are needed
+                    is_final_step = continue_data.get("is_final_step", True)
                     context = {
-                        "type": "final_output",
+                        "type": "final_output" if is_final_step or not success else "continue",
                         "tool": tool,
                         "args": args,
                         "success": success,
                         "result": tool_result
                     }
-                    current_prompt = prompth.build_prompt(prompth.SYSTEM_PROMPT, user_input, context)
-                    continue
-                else:
-                    # More steps needed
-                    context = {
-                        "type": "continue",
-                        "tool": tool,
-                        "args": args,
-                        "success": success,
-                        "result": tool_result
-                    }
-                    current_prompt = prompth.build_prompt(prompth.SYSTEM_PROMPT, user_input, context)
                     continue
             
-            # Handle OUTPUT response
-            elif "OUTPUT" in parsed_response:
-                output_data = parsed_response["OUTPUT"]
-                return output_data.get("message", "Operation completed.")
+                # Handle OUTPUT response
+                elif "OUTPUT" in parsed_response:
+                    output_data = parsed_response["OUTPUT"]
+                    yield _output(output_data.get("message", "Operation completed."))
+                    return
             
-            else:
-                return "I'm having trouble understanding the response format. Please try again."
+                else:
+                    yield _output("I'm having trouble understanding the response format. Please try again.")
+                    return
                 
-        except Exception as e:
-            logger.error(f"Error processing user input: {e}")
-            return f"An error occurred while processing your request: {str(e)}"
+            except OverloadedError:
+                raise
+            except Exception as e:
+                logger.error(f"Error processing user input: {e}")
+                yield _output(f"An error occurred while processing your request: {str(e)}")
+                return
     
-    return "The operation took too many steps. Please try breaking it down into simpler requests."
\ No newline at end of file
+        yield _output("The operation took too many steps. Please try breaking it down into simpler requests.")
+    finally:
+        metricsh.AGENT_ITERATIONS.observe(iteration_count)
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Dict
+
+import httpx
+
+from app.core.config import settings
+from app.db import session as db_session
+from app.services import llm_service
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Worker warm-up, run by main.lifespan before the worker starts accepting
+# requests: pre-open DB pool connections, a keep-alive connection of the HTTP
+# client to the weather upstream, and the LLM provider with its SDK and
+# channel. Steps run concurrently, each bounded by WARM_UP_TIMEOUT_SECONDS; a
+# failed step is logged and left to happen lazily on the first request.
+
+
+async def _warm_http_client(client: httpx.AsyncClient) -> None:
+    await client.head(settings.WHEATER_URL)
+
+
+async def _warm_llm() -> None:
+    # Builds this worker's provider singleton, after the fork
+    await llm_service.get_provider().warm_up()
+
+
+async def _step(name: str, step: Awaitable) -> float:
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(step, settings.WARM_UP_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.warning(f"Warm-up of {name} failed: {e or type(e).__name__}")
+    return time.perf_counter() - start
+
+
+async def warm_up(http_client: httpx.AsyncClient) -> Dict[str, float]:
+    """Seconds spent on each warm-up step."""
+    steps = {
+        "db_pool": db_session.warm_up_pool(settings.DB_POOL_WARM_CONNECTIONS),
+        "llm": _warm_llm(),
+    }
+    if settings.HTTP_CLIENT_WARM_UP:
+        steps["http_client"] = _warm_http_client(http_client)
+    start = time.perf_counter()
+    timings = await asyncio.gather(*(_step(name, step) for name, step in steps.items()))
+    result = dict(zip(steps, timings, strict=True))
+    logger.info(f"Worker warm-up took {time.perf_counter() - start:.3f}s: {result}")
+    return result
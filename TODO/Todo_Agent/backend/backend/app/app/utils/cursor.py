@@ -0,0 +1,19 @@
+import base64
+import json
+from datetime import datetime
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """Opaque keyset cursor pointing just after the row (created_at, id)."""
+    raw = json.dumps([created_at.isoformat(), id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
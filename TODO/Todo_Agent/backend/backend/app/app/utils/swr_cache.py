@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, TypeVar
+
+ValueType = TypeVar("ValueType")
+
+logger = logging.getLogger(__name__)
+
+
+class SWRCache(Generic[ValueType]):
+    """
+    Bounded LRU cache with stale-while-revalidate and single-flight loading.
+
+    Entries are fresh for ttl_seconds and then served stale for another
+    stale_seconds while one background task refreshes them. Concurrent misses
+    for the same key share one in-flight load instead of each calling the
+    loader. Failed loads are not cached. Not thread-safe: meant to be used
+    from a single event loop.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, stale_seconds: float = 0) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._entries: OrderedDict[Hashable, tuple[float, ValueType]] = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.evictions = 0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[ValueType]]) -> ValueType:
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if age < self.ttl_seconds + self.stale_seconds:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    self.refreshes += 1
+                    self._start_load(key, loader).add_done_callback(self._log_refresh_error)
+                return entry[1]
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = self._start_load(key, loader)
+        # shield: a cancelled caller must not cancel the load other callers share
+        return await asyncio.shield(task)
+
+    def _start_load(self, key: Hashable, loader: Callable[[], Awaitable[ValueType]]) -> asyncio.Task:
+        task = asyncio.ensure_future(self._load(key, loader))
+        self._inflight[key] = task
+        return task
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[ValueType]]) -> ValueType:
+        try:
+            value = await loader()
+            self.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _log_refresh_error(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            self.refresh_errors += 1
+            logger.warning(f"Background cache refresh failed: {task.exception()!r}")
+
+    def set(self, key: Hashable, value: ValueType) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "stale_seconds": self.stale_seconds,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+        }
@@ -0,0 +1,26 @@
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+
+# Prometheus multiprocess mode: every worker writes its metrics to files in
+# PROMETHEUS_MULTIPROC_DIR and /metrics aggregates them. Start each run with an
+# empty directory and drop the live gauges of workers that exit.
+#
+# The worker count is exported as WEB_CONCURRENCY before the workers fork, so
+# app.db.session sizes each worker's pool for the real count even when it was
+# given with -w.
+
+
+def on_starting(server):
+    os.environ["WEB_CONCURRENCY"] = str(server.cfg.workers)
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
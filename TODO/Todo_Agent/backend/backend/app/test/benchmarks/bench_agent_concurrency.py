@@ -0,0 +1,86 @@
+"""
+Concurrent-request throughput of the todo agent loop.
+
+Runs N agent requests at the same time on one event loop against a SQLite
+database and a scripted LLM provider with a fixed round-trip latency. The
+"blocking" provider sleeps on the event loop the way the synchronous
+``generate_content`` call used to; the "async" one awaits, which is what
+``call_llm`` does now.
+
+Usage (from backend/app):
+    python -m test.benchmarks.bench_agent_concurrency --requests 50 --latency 0.2
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.db.session import Base
+from app.helpers import ai_helper as aih
+from app.models.todo import Todos
+from app.services import tools_service
+from app.services.llm_service import ScriptedProvider
+
+
+USER_ID = "bench"
+SCRIPT = [
+    {"PLAN": {"tool": "get_all_todos", "args": "", "is_multi_step": False}},
+    {"OUTPUT": {"message": "Here are your todos.", "action_taken": "Listed todos"}},
+]
+
+
+class BlockingScriptedProvider(ScriptedProvider):
+    """Scripted provider that blocks the event loop like the old sync SDK call."""
+
+    async def generate(self, contents):
+        time.sleep(self.latency)
+        return self.reply_for(contents)
+
+
+async def _run(provider_cls, requests: int, latency: float, db_url: str) -> float:
+    engine = create_async_engine(db_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_factory() as db:
+        for i in range(20):
+            await Todos.create_todos(db, USER_ID, f"seed task {i}")
+
+    provider = provider_cls(SCRIPT, latency=latency)
+    aih.get_llm_provider = lambda: provider
+    # Every request sends the same prompt; measure the round-trips, not the cache
+    settings.LLM_CACHE_ENABLED = False
+
+    async def one_request():
+        async with session_factory() as db:
+            return await tools_service.process_todo_request("what is on my plate today?", db, USER_ID)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_request() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="LLM latency (s)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, provider_cls in (("before (blocking)", BlockingScriptedProvider), ("after (async)", ScriptedProvider)):
+            db_url = f"sqlite+aiosqlite:///{Path(tmp) / (provider_cls.__name__ + '.db')}"
+            elapsed = asyncio.run(_run(provider_cls, args.requests, args.latency, db_url))
+            print(
+                f"{label:<18} {args.requests} requests in {elapsed:6.2f}s "
+                f"-> {args.requests / elapsed:7.1f} req/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Microbenchmarks of the agent's pure-Python hot paths, with a regression check.
+
+Times parse_llm_response on realistic and malformed model output,
+build_step_prompt for every context type,
+execute_database_operation and the Todos CRUD methods against an embedded
+SQLite database, and uuid7 generation. Each case reports the best per-call
+time over several repeats.
+
+Timings are also divided by a fixed pure-Python calibration loop measured
+right before each case, and the regression check compares those ratios with
+baseline.json, so a baseline recorded on one machine stays usable on another.
+With --check, a case over the tolerance is measured again up to
+--confirm-runs times and only fails if its best ratio stays over it, so a
+single noisy run does not fail the check.
+
+Usage (from backend/app):
+    python -m test.benchmarks.bench_hot_paths
+    python -m test.benchmarks.bench_hot_paths --check            # exit 1 on regression
+    python -m test.benchmarks.bench_hot_paths --update-baseline  # after an intended change
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.db.session import Base
+from app.helpers import data_helper as datah
+from app.helpers import prompt_helper as prompth
+from app.models.todo import Todos
+from app.services import tools_service
+from app.utils.uuid6 import uuid7
+
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+SEED_ROWS = 200
+USER_ID = "bench"
+
+LLM_OUTPUTS = {
+    "plan": json.dumps(
+        {"PLAN": {"tool": "create_todos", "args": "buy milk", "is_multi_step": False}}
+    ),
+    "fenced_output": "```json\n"
+    + json.dumps(
+        {"OUTPUT": {"message": "Added 'buy milk' to your list.", "action_taken": "Created todo"}},
+        indent=2,
+    )
+    + "\n```",
+    "batch": json.dumps(
+        {
+            "PLAN": {
+                "operations": [
+                    {"tool": "create_todos", "args": f"task number {i}"} for i in range(20)
+                ],
+                "is_multi_step": False,
+            }
+        }
+    ),
+    "concatenation": '{"OUTPUT": {"message": "Your todos:" + "\\n".join(["1. milk", "2. bread"]), '
+    '"action_taken": "Listed"}}',
+    "truncated_output": '{"OUTPUT": {"message": "Here are your todos: 1. buy milk, 2. call',
+    "task_mentions_json": json.dumps(
+        {"PLAN": {"tool": "create_todos", "args": "update the json schema docs", "is_multi_step": False}}
+    ),
+    "wrapped_in_prose": "Sure, here is the plan: "
+    + json.dumps({"CONTINUE": {"tool": "delete_todos_by_id", "args": 4, "is_final_step": True}})
+    + " Let me know if you need anything else.",
+    "prose": "I am not sure what you mean, could you clarify which todo?",
+}
+
+TOOL_RESULT = "Current todos (3):\nid|task\n1|buy milk\n2|call mom\n3|fix bike"
+PROMPT_CONTEXTS = {
+    "none": None,
+    "candidates": {"type": "candidates", "candidates": "1|buy milk|0.82\n2|buy bread|0.41"},
+    "continue": {
+        "type": "continue",
+        "tool": "get_all_todos",
+        "args": "",
+        "success": True,
+        "result": TOOL_RESULT,
+    },
+    "output": {
+        "type": "output",
+        "tool": "get_all_todos",
+        "args": "",
+        "success": True,
+        "result": TOOL_RESULT,
+    },
+    "final_output": {
+        "type": "final_output",
+        "tool": "delete_todos_by_id",
+        "args": 2,
+        "success": True,
+        "result": "Successfully deleted todo with ID: 2",
+    },
+}
+
+
+EARLIER_STEPS = [
+    "get_all_todos() -> succeeded: Current todos (3):",
+    "search_todos(milk) -> succeeded: Best matches for 'milk':",
+]
+
+
+def _calibration():
+    total = 0
+    for i in range(1000):
+        total += i * i % 7
+    return total
+
+
+def _sync_cases():
+    cases = {"uuid7": uuid7}
+    for name, text in LLM_OUTPUTS.items():
+        cases[f"parse_llm_response[{name}]"] = lambda text=text: datah.parse_llm_response(text)
+    for name, context in PROMPT_CONTEXTS.items():
+        cases[f"build_step_prompt[{name}]"] = lambda context=context: prompth.build_step_prompt(
+            "delete the milk one", context, EARLIER_STEPS, len(EARLIER_STEPS) + 1
+        )
+    return cases
+
+
+def _async_cases(session_factory):
+    async def in_session(operation):
+        async with session_factory() as db:
+            return await operation(db)
+
+    async def create_and_delete(db):
+        task_id = await Todos.create_todos(db, USER_ID, "benchmark todo")
+        await Todos.delete_todos_by_id(db, USER_ID, task_id)
+
+    async def tool_create_and_delete(db):
+        _, result = await tools_service.execute_database_operation("create_todos", "benchmark todo", db, USER_ID)
+        task_id = int(result.rsplit("ID: ", 1)[1].rstrip(")"))
+        await tools_service.execute_database_operation("delete_todos_by_id", task_id, db, USER_ID)
+
+    return {
+        "Todos.get_all_todos": lambda: in_session(lambda db: Todos.get_all_todos(db, USER_ID)),
+        "Todos.get_todos_page": lambda: in_session(lambda db: Todos.get_todos_page(db, USER_ID, 50)),
+        "Todos.search_todos": lambda: in_session(lambda db: Todos.search_todos(db, USER_ID, "call mom")),
+        "Todos.create+delete_by_id": lambda: in_session(create_and_delete),
+        "tool[get_all_todos]": lambda: in_session(
+            lambda db: tools_service.execute_database_operation("get_all_todos", "", db, USER_ID)
+        ),
+        "tool[search_todos]": lambda: in_session(
+            lambda db: tools_service.execute_database_operation("search_todos", "call mom", db, USER_ID)
+        ),
+        "tool[create+delete_by_id]": lambda: in_session(tool_create_and_delete),
+    }
+
+
+def _best_per_call(run_batch, min_time: float, repeats: int) -> float:
+    """Best seconds per call over repeats, each repeat running at least min_time."""
+    number = 1
+    while True:
+        elapsed = run_batch(number)
+        if elapsed >= min_time / 10 or number >= 1 << 20:
+            break
+        number *= 2
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    return min(run_batch(number) for _ in range(repeats)) / number
+
+
+def _sync_batch(func):
+    def run(number):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        return time.perf_counter() - start
+
+    return run
+
+
+def _async_batch(loop, factory):
+    async def many(number):
+        start = time.perf_counter()
+        for _ in range(number):
+            await factory()
+        return time.perf_counter() - start
+
+    return lambda number: loop.run_until_complete(many(number))
+
+
+def _run(selected, min_time: float, repeats: int):
+    """Per-call seconds and calibration ratio of every case for which selected(name) is true."""
+    results = {}
+    loop = asyncio.new_event_loop()
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}")
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        async def setup():
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            async with session_factory() as db:
+                verbs = ["buy", "call", "fix", "clean", "email"]
+                objects = ["milk", "mom", "bike", "garage", "dentist", "rent", "report"]
+                await Todos.bulk_create_todos(
+                    db, USER_ID, [f"{verbs[i % 5]} {objects[i % 7]} {i}" for i in range(SEED_ROWS)]
+                )
+
+        loop.run_until_complete(setup())
+        cases = {name: _sync_batch(func) for name, func in _sync_cases().items()}
+        cases.update(
+            {name: _async_batch(loop, factory) for name, factory in _async_cases(session_factory).items()}
+        )
+        calibrate = _sync_batch(_calibration)
+        for name, run_batch in cases.items():
+            if not selected(name):
+                continue
+            # Calibrate next to every case so drifting CPU speed cancels out
+            calibration = _best_per_call(calibrate, min_time / 2, repeats)
+            seconds = _best_per_call(run_batch, min_time, repeats)
+            results[name] = (seconds, seconds / calibration)
+        loop.run_until_complete(engine.dispose())
+    loop.close()
+    return results
+
+
+def _report(results, baseline, tolerance: float) -> list:
+    base_ratios = (baseline or {}).get("ratios", {})
+    regressions = []
+    print(f"{'case':<36} {'per call':>12} {'x calib':>9} {'vs base':>9}")
+    for name, (seconds, ratio) in results.items():
+        line = f"{name:<36} {seconds * 1e6:9.2f} us {ratio:9.4f}"
+        if name in base_ratios:
+            change = ratio / base_ratios[name]
+            line += f" {change:8.2f}x"
+            if change > 1 + tolerance:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filter", action="append", default=[], help="only cases containing this text")
+    parser.add_argument("--min-time", type=float, default=0.1, help="seconds per repeat")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown vs baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 if any case regressed")
+    parser.add_argument(
+        "--confirm-runs", type=int, default=3, help="re-measurements of a regressed case before --check fails"
+    )
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    logging.disable(logging.ERROR)  # malformed-output cases log on every call
+    settings.LLM_CACHE_ENABLED = False
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else None
+    results = _run(
+        lambda name: not args.filter or any(text in name for text in args.filter), args.min_time, args.repeats
+    )
+    regressions = _report(results, baseline, args.tolerance)
+    for _ in range(args.confirm_runs if args.check else 0):
+        if not regressions:
+            break
+        # Keep the best of all runs; noise only ever makes a case slower
+        print(f"Measuring {len(regressions)} regressed case(s) again")
+        for name, result in _run(set(regressions).__contains__, args.min_time, args.repeats).items():
+            results[name] = min(results[name], result, key=lambda item: item[1])
+        regressions = _report({name: results[name] for name in regressions}, baseline, args.tolerance)
+
+    if args.update_baseline:
+        # A filtered run only replaces the cases it measured
+        ratios = dict((baseline or {}).get("ratios", {})) if args.filter else {}
+        per_call_us = dict((baseline or {}).get("per_call_us", {})) if args.filter else {}
+        for name, (seconds, ratio) in results.items():
+            ratios[name] = round(ratio, 6)
+            per_call_us[name] = round(seconds * 1e6, 3)
+        BASELINE_PATH.write_text(
+            json.dumps({"ratios": ratios, "per_call_us": per_call_us}, indent=2, sort_keys=True) + "\n"
+        )
+        print(f"Baseline written to {BASELINE_PATH}")
+    if args.check and regressions:
+        print(f"{len(regressions)} case(s) slower than baseline by more than {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Worker boot time: import-time profile, lifespan warm-up and first-request latency.
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter and
+reports where the import time goes, aggregated per top-level package, plus
+the slowest individual modules. Then boots the app several times in fresh
+interpreters against a SQLite database and the scripted LLM provider, timing
+`import app.main`, the lifespan startup (engines, clients, warm-up) and the
+first and second agent requests.
+
+--check fails when a provider SDK that should only load on first use (see
+LAZY_MODULES) is imported with the app, or when a median exceeds the given
+limits.
+
+Usage (from backend/app):
+    python -m test.benchmarks.bench_startup
+    python -m test.benchmarks.bench_startup --runs 5 --check --max-import-seconds 2
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+
+APP_DIR = Path(__file__).resolve().parents[2]
+LAZY_MODULES = ("google.generativeai", "grpc", "redis")
+SCRIPT = [
+    {"PLAN": {"tool": "get_all_todos", "args": "", "is_multi_step": False}},
+    {"OUTPUT": {"message": "Here are your todos.", "action_taken": "Listed todos"}},
+]
+USER_INPUT = "what is on my plate today?"
+HEADERS = {"X-User-Id": "bench"}
+PHASES = ("import", "startup", "first_request", "second_request")
+
+
+def _environment(tmp: Path) -> dict:
+    script_path = tmp / "script.jsonl"
+    script_path.write_text("".join(json.dumps({"script": entry}) + "\n" for entry in SCRIPT))
+    env = dict(os.environ)
+    env.setdefault("BACKEND_CORS_ORIGINS", '["http://localhost"]')
+    env.update(
+        {
+            "PYTHONPATH": str(APP_DIR),
+            "DATABASE_URL": f"sqlite+aiosqlite:///{tmp / 'startup.db'}",
+            "LLM_PROVIDER": "scripted",
+            "LLM_SCRIPT_PATH": str(script_path),
+            "LLM_CACHE_ENABLED": "false",
+            "HTTP_CLIENT_WARM_UP": "false",
+            "JOB_BROKER_URL": "",
+        }
+    )
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    return env
+
+
+def _import_profile(env: dict) -> list:
+    """(module, self seconds, cumulative seconds, depth) per module imported with the app."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6, depth))
+    return modules
+
+
+def _report_profile(modules: list, top: int) -> None:
+    total = sum(self_s for _, self_s, _, _ in modules)
+    by_package = defaultdict(float)
+    for name, self_s, _, _ in modules:
+        by_package[name.split(".")[0]] += self_s
+    print(f"import app.main: {total:.3f}s over {len(modules)} modules\n")
+    print(f"{'package':<32} {'self':>9} {'share':>7}")
+    for package, seconds in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f"{package:<32} {seconds:8.3f}s {seconds / total:7.1%}")
+    print(f"\n{'slowest modules (cumulative)':<48} {'time':>9}")
+    for name, _, cumulative, depth in sorted(modules, key=lambda module: -module[2])[:top]:
+        print(f"{'  ' * min(depth, 6) + name:<48} {cumulative:8.3f}s")
+
+
+def _eager_modules(modules: list) -> list:
+    """LAZY_MODULES that were imported with the app."""
+    imported = {name for name, _, _, _ in modules}
+    return [lazy for lazy in LAZY_MODULES if any(n == lazy or n.startswith(lazy + ".") for n in imported)]
+
+
+def _child() -> None:
+    """One boot in this interpreter; prints phase timings as JSON."""
+    start = time.perf_counter()
+    import app.main  # noqa: F401
+    imported = time.perf_counter()
+
+    import asyncio
+    from fastapi.testclient import TestClient
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app.core.config import settings
+    from app.db.session import Base
+
+    async def create_tables():
+        engine = create_async_engine(settings.DATABASE_URL)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await engine.dispose()
+
+    asyncio.run(create_tables())
+    url = f"{settings.API_V1_STR}/todo/todo"
+    timings = {"import": imported - start}
+    started = time.perf_counter()
+    with TestClient(app.main.app) as client:
+        timings["startup"] = time.perf_counter() - started
+        for phase in ("first_request", "second_request"):
+            sent = time.perf_counter()
+            client.post(url, json={"user_input": USER_INPUT}, headers=HEADERS).raise_for_status()
+            timings[phase] = time.perf_counter() - sent
+    print(json.dumps(timings))
+
+
+def _boot(env: dict) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-m", "test.benchmarks.bench_startup", "--child"],
+        cwd=APP_DIR, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Boot failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3, help="fresh-interpreter boots to time")
+    parser.add_argument("--top", type=int, default=15, help="rows in the import profile")
+    parser.add_argument("--check", action="store_true", help="exit 1 on a lazy-import or limit violation")
+    parser.add_argument("--max-import-seconds", type=float)
+    parser.add_argument("--max-startup-seconds", type=float)
+    parser.add_argument("--max-first-request-seconds", type=float)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child()
+        return
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _environment(Path(tmp))
+        modules = _import_profile(env)
+        _report_profile(modules, args.top)
+        eager = _eager_modules(modules)
+        if eager:
+            failures.append(f"imported with the app instead of on first use: {', '.join(eager)}")
+
+        runs = []
+        for _ in range(args.runs):
+            (Path(tmp) / "startup.db").unlink(missing_ok=True)
+            runs.append(_boot(env))
+    print(f"\n{'phase':<16} {'median':>9} {'min':>9} {'max':>9}   ({args.runs} boots)")
+    for phase in PHASES:
+        values = [run[phase] for run in runs]
+        print(f"{phase:<16} {statistics.median(values):8.3f}s {min(values):8.3f}s {max(values):8.3f}s")
+
+    limits = {
+        "import": args.max_import_seconds,
+        "startup": args.max_startup_seconds,
+        "first_request": args.max_first_request_seconds,
+    }
+    for phase, limit in limits.items():
+        median = statistics.median(run[phase] for run in runs)
+        if limit is not None and median > limit:
+            failures.append(f"{phase} median {median:.3f}s is over {limit}s")
+    if args.check and failures:
+        print("\n" + "\n".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+
+# Settings are read when app.core.config is imported, so the test
+# environment has to be in place before any app module is collected.
+_TMP = tempfile.mkdtemp(prefix="todo-agent-tests-")
+os.environ.setdefault("BACKEND_CORS_ORIGINS", '["http://localhost"]')
+os.environ.update(
+    {
+        "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(_TMP, 'test.db')}",
+        "LLM_PROVIDER": "scripted",
+        "LLM_CACHE_REDIS_URL": "",
+        "JOB_BROKER_URL": "",
+        "HTTP_CLIENT_WARM_UP": "false",
+        "WARM_UP_ENABLED": "false",
+    }
+)
+os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+import asyncio  # noqa: E402
+import uuid  # noqa: E402
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+from sqlalchemy.pool import NullPool  # noqa: E402
+
+from app.db import session as db_session  # noqa: E402
+from app.helpers import ai_helper as aih  # noqa: E402
+from app.db.session import Base  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import todo  # noqa: E402,F401
+from app.services.llm_service import ScriptedProvider  # noqa: E402
+
+
+async def _create_tables(engine) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Sessions on a fresh SQLite database; NullPool so every asyncio.run gets its own connections."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'todos.db'}", poolclass=NullPool)
+    asyncio.run(_create_tables(engine))
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def user_id():
+    """A user of its own per test, so per-user caches never carry over."""
+    return f"user-{uuid.uuid4().hex[:12]}"
+
+
+@pytest.fixture
+def client():
+    """The app with its lifespan (engines, job workers) on the shared test database."""
+    with TestClient(app) as client:
+        client.portal.call(_create_tables, db_session.async_engine)
+        yield client
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    """Scripted LLM answering "Answered by the LLM." to every request, with the response cache off."""
+    provider = ScriptedProvider([{"OUTPUT": {"message": "Answered by the LLM.", "action_taken": "None"}}])
+    monkeypatch.setattr(aih, "get_llm_provider", lambda: provider)
+    monkeypatch.setattr(aih.settings, "LLM_CACHE_ENABLED", False)
+    return provider
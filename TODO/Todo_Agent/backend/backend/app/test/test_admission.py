@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from fastapi import Request
+
+from app.models.todo import Todos
+from app.services import admission_service, tools_service
+from app.services.admission_service import LLMConcurrencyLimiter, OverloadedError
+
+
+BUSY_SECONDS = 0.2
+
+
+def _ask_while_busy(session_factory, user_id, monkeypatch, user_input, admitted=False):
+    """Run a request while the only LLM slot is taken for BUSY_SECONDS and nothing may queue."""
+    limiter = LLMConcurrencyLimiter(max_in_flight=1, max_queued=0, queue_timeout=0.05, retry_after=5)
+    monkeypatch.setattr(admission_service, "_llm_limiter", limiter)
+
+    async def hold_slot(taken: asyncio.Event):
+        async with limiter.slot():
+            taken.set()
+            await asyncio.sleep(BUSY_SECONDS)
+
+    async def scenario():
+        taken = asyncio.Event()
+        holder = asyncio.create_task(hold_slot(taken))
+        await taken.wait()
+        try:
+            async with session_factory() as db:
+                await Todos.bulk_create_todos(db, user_id, ["Buy milk"])
+                message = "Operation completed."
+                async for event in tools_service.run_todo_request(user_input, db, user_id, admitted=admitted):
+                    if event["event"] == "output":
+                        message = event["data"]["message"]
+                return message
+        finally:
+            await holder
+
+    return asyncio.run(scenario())
+
+
+def test_requests_without_an_llm_call_are_not_shed(session_factory, user_id, provider, monkeypatch):
+    message = _ask_while_busy(session_factory, user_id, monkeypatch, "list my todos")
+
+    assert message.startswith("You have 1 todo:")
+    assert provider.calls == 0
+
+
+def test_new_request_is_shed_on_its_first_llm_call(session_factory, user_id, provider, monkeypatch):
+    with pytest.raises(OverloadedError):
+        _ask_while_busy(session_factory, user_id, monkeypatch, "what should I do first?")
+
+    assert provider.calls == 0
+
+
+def test_admitted_request_waits_for_a_slot(session_factory, user_id, provider, monkeypatch):
+    message = _ask_while_busy(session_factory, user_id, monkeypatch, "what should I do first?", admitted=True)
+
+    assert message == "Answered by the LLM."
+    assert provider.calls == 1
+
+
+@pytest.mark.parametrize("trusted, expected", [(False, "10.0.0.5"), (True, "203.0.113.7")])
+def test_forwarded_for_is_only_trusted_when_enabled(monkeypatch, trusted, expected):
+    monkeypatch.setattr(admission_service.settings, "RATE_LIMIT_TRUST_FORWARDED_FOR", trusted)
+    request = Request({
+        "type": "http",
+        "headers": [(b"x-forwarded-for", b"198.51.100.1, 203.0.113.7")],
+        "client": ("10.0.0.5", 4321),
+    })
+
+    assert admission_service.client_id(request) == expected
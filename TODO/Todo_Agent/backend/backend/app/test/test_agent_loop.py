@@ -0,0 +1,60 @@
+import asyncio
+
+from app.helpers import ai_helper as aih
+from app.helpers import prompt_helper as prompth
+from app.models.todo import Todos
+from app.services import tools_service
+from app.services.llm_service import ScriptedProvider
+
+
+class PromptRecorder(ScriptedProvider):
+    def __init__(self, script):
+        super().__init__(script)
+        self.prompts = []
+
+    async def generate(self, contents):
+        self.prompts.append(contents)
+        return await super().generate(contents)
+
+
+SCRIPT = [
+    {"PLAN": {"tool": "get_all_todos", "args": "", "is_multi_step": True}},
+    {"CONTINUE": {"tool": "create_todos", "args": "buy eggs", "is_final_step": False}},
+    {"CONTINUE": {"tool": "search_todos", "args": "eggs", "is_final_step": True}},
+    {"OUTPUT": {"message": "Added eggs.", "action_taken": "Created a todo"}},
+]
+
+
+def _run_agent(session_factory, user_id, monkeypatch, user_input):
+    provider = PromptRecorder(SCRIPT)
+    monkeypatch.setattr(aih, "get_llm_provider", lambda: provider)
+    monkeypatch.setattr(tools_service.settings, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(tools_service.settings, "SIMILARITY_INDEX_ENABLED", False)
+
+    async def scenario():
+        async with session_factory() as db:
+            await Todos.bulk_create_todos(db, user_id, [f"old task {i}" for i in range(30)])
+            return await tools_service.process_todo_request(user_input, db, user_id)
+
+    return asyncio.run(scenario()), provider.prompts
+
+
+def test_each_step_sends_only_the_latest_result(session_factory, user_id, monkeypatch):
+    message, prompts = _run_agent(session_factory, user_id, monkeypatch, "add eggs if I don't have them")
+
+    assert message == "Added eggs."
+    assert [prompth.step_number(prompt) for prompt in prompts] == [1, 2, 3, 4]
+    assert all(isinstance(prompt, str) and "add eggs if I don't have them" in prompt for prompt in prompts)
+    # The todo table is in the prompt right after get_all_todos and only
+    # summarized afterwards
+    assert "old task 17" in prompts[1]
+    assert not any("old task 17" in prompt for prompt in prompts[2:])
+    assert "1. get_all_todos() -> succeeded: Current todos (30):" in prompts[2]
+    assert "2. create_todos(buy eggs) -> succeeded" in prompts[3]
+
+
+def test_step_summary_is_one_bounded_line():
+    summary = prompth.step_summary("create_todos", "x" * 500, True, "first line\nsecond line")
+    assert "\n" not in summary
+    assert summary.endswith("succeeded: first line")
+    assert len(summary) < 2 * prompth.SUMMARY_MAX_CHARS
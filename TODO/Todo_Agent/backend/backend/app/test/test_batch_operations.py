@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from app.models.todo import Todos
+from app.services import tools_service
+
+
+def _run(session_factory, user_id, operations, fail_commit=False):
+    async def scenario():
+        async with session_factory() as db:
+            [(milk_id, _)] = await Todos.bulk_create_todos(db, user_id, ["Buy milk"])
+            if fail_commit:
+
+                async def commit():
+                    raise RuntimeError("connection lost")
+
+                db.commit = commit
+            success, message = await tools_service.execute_database_operations(
+                operations(milk_id) if callable(operations) else operations, db, user_id
+            )
+        async with session_factory() as db:
+            remaining = [todo.todo_task for todo in await Todos.get_all_todos(db, user_id)]
+        return success, message, remaining
+
+    return asyncio.run(scenario())
+
+
+def test_batch_commits_all_operations_together(session_factory, user_id):
+    operations = [
+        {"tool": "create_todos", "args": "Call mom"},
+        {"tool": "create_todos", "args": "Fix bike"},
+    ]
+    success, message, remaining = _run(session_factory, user_id, operations)
+
+    assert success
+    assert message.startswith("Executed 2 operations:\n1. OK")
+    assert sorted(remaining) == ["Buy milk", "Call mom", "Fix bike"]
+
+
+def test_failed_operation_is_reported_without_dropping_the_others(session_factory, user_id):
+    operations = [
+        {"tool": "create_todos", "args": "Call mom"},
+        {"tool": "no_such_tool", "args": ""},
+    ]
+    success, message, remaining = _run(session_factory, user_id, operations)
+
+    assert not success
+    assert "1. OK" in message and "2. FAILED" in message
+    assert sorted(remaining) == ["Buy milk", "Call mom"]
+
+
+def test_failing_commit_rolls_back_every_operation(session_factory, user_id):
+    def operations(milk_id):
+        return [
+            {"tool": "create_todos", "args": "Call mom"},
+            {"tool": "delete_todos_by_id", "args": milk_id},
+        ]
+
+    success, message, remaining = _run(session_factory, user_id, operations, fail_commit=True)
+
+    assert not success
+    assert message.startswith("All 2 operations were rolled back, nothing was changed")
+    assert remaining == ["Buy milk"]
+
+
+def test_batch_over_the_limit_is_refused(session_factory, user_id, monkeypatch):
+    monkeypatch.setattr(tools_service.settings, "AGENT_MAX_BATCH_OPERATIONS", 2)
+    operations = [{"tool": "create_todos", "args": f"Todo {i}"} for i in range(3)]
+    success, message, remaining = _run(session_factory, user_id, operations)
+
+    assert not success
+    assert message.startswith("Too many operations (3)")
+    assert remaining == ["Buy milk"]
+
+
+@pytest.mark.parametrize("operations", [{"tool": "create_todos"}, "create_todos"])
+def test_operations_must_be_a_list(session_factory, user_id, operations):
+    success, message, _ = _run(session_factory, user_id, operations)
+
+    assert not success
+    assert message.startswith("Invalid operations")
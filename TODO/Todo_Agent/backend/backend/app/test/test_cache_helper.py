@@ -0,0 +1,65 @@
+import asyncio
+from collections import OrderedDict
+
+import pytest
+
+from app.helpers import cache_helper as cacheh
+from app.models.todo import Todos
+
+
+PROMPT = "Step 1 of at most 5.\nUser input: what is on my list?\n"
+RESPONSE = {"OUTPUT": {"message": "Two todos.", "action_taken": "None"}}
+
+
+@pytest.fixture(autouse=True)
+def local_versions(monkeypatch):
+    monkeypatch.setattr(cacheh.settings, "LLM_CACHE_REDIS_URL", None)
+    monkeypatch.setattr(cacheh, "_local_versions", OrderedDict())
+    monkeypatch.setattr(cacheh, "_version_floor", 0)
+
+
+async def _cached(user_id):
+    return await cacheh.get_cached_response(await cacheh.build_cache_key(PROMPT, user_id))
+
+
+def test_write_invalidates_only_the_writers_cached_reads(session_factory, user_id):
+    alice, bob = f"{user_id}-a", f"{user_id}-b"
+
+    async def scenario():
+        for user in (alice, bob):
+            await cacheh.set_cached_response(await cacheh.build_cache_key(PROMPT, user), RESPONSE)
+        async with session_factory() as db:
+            await Todos.create_todos(db, alice, "Buy milk")
+        return (
+            await cacheh.get_todos_version(alice),
+            await cacheh.get_todos_version(bob),
+            await _cached(alice),
+            await _cached(bob),
+        )
+
+    alice_version, bob_version, alice_cached, bob_cached = asyncio.run(scenario())
+
+    assert (alice_version, bob_version) == (1, 0)
+    assert alice_cached is None
+    assert bob_cached == RESPONSE
+
+
+def test_versions_are_bounded_and_never_go_back(monkeypatch, user_id):
+    monkeypatch.setattr(cacheh.settings, "TODO_VERSION_MAX_USERS", 2)
+    alice, bob, carol = (f"{user_id}-{name}" for name in ("a", "b", "c"))
+
+    async def scenario():
+        for _ in range(3):
+            await cacheh.bump_todos_version(alice)
+        stale_key = await cacheh.build_cache_key(PROMPT, alice)
+        await cacheh.set_cached_response(stale_key, RESPONSE)
+        await cacheh.bump_todos_version(alice)
+        await cacheh.bump_todos_version(bob)
+        await cacheh.bump_todos_version(carol)  # evicts alice at version 4
+        return await cacheh.get_todos_version(alice), await _cached(alice)
+
+    alice_version, alice_cached = asyncio.run(scenario())
+
+    assert list(cacheh._local_versions) == [bob, carol]
+    assert alice_version == 4
+    assert alice_cached is None
@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.llm_service import CompositeProvider, ProviderError, ScriptedProvider
+
+CONVERSATION = [{"role": "user", "parts": ["add milk"]}]
+
+
+class TrackedProvider(ScriptedProvider):
+    """Scripted provider answering its own name, or failing, that records how each call ended."""
+
+    def __init__(self, name: str, latency: float = 0.0, fails: bool = False) -> None:
+        super().__init__([] if fails else [name], latency=latency, name=name)
+        self.cancelled = 0
+
+    async def generate(self, contents):
+        try:
+            return await super().generate(contents)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+def generate(provider):
+    """Answer of provider to CONVERSATION and the seconds it took."""
+    async def run():
+        start = time.monotonic()
+        result = await provider.generate(CONVERSATION)
+        return result, time.monotonic() - start
+
+    return asyncio.run(run())
+
+
+def test_failing_provider_falls_back_to_the_next():
+    broken, backup = TrackedProvider("broken", fails=True), TrackedProvider("backup")
+
+    result, _ = generate(CompositeProvider([broken, backup]))
+
+    assert (result.text, result.provider) == ("backup", "backup")
+    assert (broken.calls, backup.calls) == (1, 1)
+
+
+def test_provider_over_budget_is_cancelled_and_falls_back():
+    slow, backup = TrackedProvider("slow", latency=1), TrackedProvider("backup")
+
+    result, elapsed = generate(CompositeProvider([slow, backup], budgets={"slow": 0.05}))
+
+    assert result.text == "backup"
+    assert elapsed < 0.5
+    assert slow.cancelled == 1
+
+
+def test_default_budget_applies_to_providers_without_one():
+    slow, backup = TrackedProvider("slow", latency=1), TrackedProvider("backup", latency=0.1)
+
+    result, _ = generate(CompositeProvider([slow, backup], budgets={"backup": 1}, default_budget=0.05))
+
+    assert result.text == "backup"
+
+
+def test_hedge_races_a_slow_provider_and_cancels_the_loser():
+    slow, fast = TrackedProvider("slow", latency=1), TrackedProvider("fast")
+
+    result, elapsed = generate(CompositeProvider([slow, fast], hedge_after=0.05))
+
+    assert result.text == "fast"
+    assert elapsed < 0.5
+    assert slow.cancelled == 1
+
+
+def test_hedge_is_not_started_for_a_quick_answer():
+    primary, backup = TrackedProvider("primary", latency=0.01), TrackedProvider("backup")
+
+    result, _ = generate(CompositeProvider([primary, backup], hedge_after=0.5))
+
+    assert result.text == "primary"
+    assert backup.calls == 0
+
+
+def test_hedges_are_capped_by_max_in_flight():
+    first, second = TrackedProvider("first", latency=0.2), TrackedProvider("second", latency=0.3)
+    third = TrackedProvider("third")
+
+    result, _ = generate(CompositeProvider([first, second, third], hedge_after=0.02, max_in_flight=2))
+
+    assert result.text == "first"
+    assert third.calls == 0
+    assert second.cancelled == 1
+
+
+def test_error_lists_every_provider_when_all_fail():
+    broken, slow = TrackedProvider("broken", fails=True), TrackedProvider("slow", latency=1)
+
+    with pytest.raises(ProviderError) as error:
+        generate(CompositeProvider([broken, slow], budgets={"slow": 0.05}))
+
+    assert "broken" in str(error.value) and "slow exceeded" in str(error.value)
+
+
+def test_stream_falls_back_before_the_first_chunk():
+    slow, backup = TrackedProvider("slow", latency=1), TrackedProvider("backup")
+    composite = CompositeProvider([slow, backup], budgets={"slow": 0.05})
+
+    async def run():
+        return [chunk.text async for chunk in composite.stream(CONVERSATION)]
+
+    assert asyncio.run(run()) == ["backup"]
@@ -0,0 +1,117 @@
+import json
+
+import pytest
+
+from app.helpers.data_helper import OutputMessageStream, parse_llm_response
+
+
+def response(message: str) -> str:
+    return json.dumps({"OUTPUT": {"message": message, "action_taken": "none"}})
+
+
+def stream(text: str, size: int) -> list[str]:
+    """Feed text in chunks of size characters and return what each chunk yielded."""
+    message_stream = OutputMessageStream()
+    return [message_stream.feed(text[i : i + size]) for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "Added: buy milk",
+        'Quote " and backslash \\ and slash /',
+        "Line one\nLine two\ttabbed",
+        "Añadido: café con leche 🍰",
+        "𝄞 clef and 😀 emoji",
+    ],
+)
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7])
+def test_message_survives_any_chunk_boundary(message, size):
+    for text in (response(message), json.dumps(json.loads(response(message)), ensure_ascii=False)):
+        assert "".join(stream(text, size)) == message
+
+
+def test_split_escape_is_held_back_until_complete():
+    message_stream = OutputMessageStream()
+
+    assert message_stream.feed('{"OUTPUT": {"message": "caf\\u00') == "caf"
+    assert message_stream.feed('e9 ok') == "é ok"
+
+
+def test_split_surrogate_pair_decodes_to_one_character():
+    message_stream = OutputMessageStream()
+
+    assert message_stream.feed('{"OUTPUT": {"message": "hi \\ud83d') == "hi "
+    assert message_stream.feed("\\ude00") == "😀"
+    assert message_stream.feed('"}}') == ""
+
+
+def test_lone_high_surrogate_is_not_held_forever():
+    message_stream = OutputMessageStream()
+
+    assert message_stream.feed('{"OUTPUT": {"message": "\\ud83d') == ""
+    assert message_stream.feed('!"}}') == "\ud83d!"
+
+
+def test_message_ends_at_its_closing_quote():
+    message_stream = OutputMessageStream()
+
+    assert message_stream.feed('{"OUTPUT": {"message": "done", "action_taken": "x"}}') == "done"
+    assert message_stream.feed('"more"') == ""
+
+
+def test_response_without_output_message_yields_nothing():
+    text = json.dumps({"PLAN": {"message": "not for the user"}})
+
+    assert "".join(stream(text, 4)) == ""
+
+
+OUTPUT = {"OUTPUT": {"message": "Added 'learn json'", "action_taken": "create_todos"}}
+PLAN = {"PLAN": {"tool": "create_todos", "args": "learn json", "is_multi_step": False}}
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        json.dumps(PLAN),
+        "```json\n" + json.dumps(PLAN) + "\n```",
+        "Here is the plan for the json task:\n" + json.dumps(PLAN) + "\nLet me know.",
+        "Sure!\n```json\n" + json.dumps(PLAN, indent=2) + "\n```\nDone.",
+    ],
+    ids=["plain", "fenced", "prose", "prose-and-fence"],
+)
+def test_parser_finds_the_response(text):
+    assert parse_llm_response(text) == PLAN
+
+
+def test_parser_accepts_raw_newlines_inside_strings():
+    text = '{"OUTPUT": {"message": "Your todos:\n- milk\n- eggs"}}'
+
+    assert parse_llm_response(text)["OUTPUT"]["message"] == "Your todos:\n- milk\n- eggs"
+
+
+def test_parser_rejects_several_top_level_keys():
+    text = json.dumps({**PLAN, **OUTPUT})
+
+    assert parse_llm_response(text) == {"error": "Failed to parse response"}
+
+
+def test_parser_rejects_several_keys_wrapped_in_prose():
+    text = "Plan and answer:\n" + json.dumps({**PLAN, **OUTPUT})
+
+    assert parse_llm_response(text) == {"error": "Failed to parse response"}
+
+
+@pytest.mark.parametrize("cut", [-1, -3, -12])
+def test_parser_keeps_the_written_part_of_a_truncated_output(cut):
+    text = json.dumps(OUTPUT)[:cut]
+
+    message = parse_llm_response(text)["OUTPUT"]["message"]
+
+    assert message and "Added 'learn json'".startswith(message)
+
+
+def test_parser_does_not_guess_from_a_complete_malformed_output():
+    text = '{"OUTPUT": {"message": "Added milk"} "extra"}'
+
+    assert parse_llm_response(text) == {"error": "Failed to parse response"}
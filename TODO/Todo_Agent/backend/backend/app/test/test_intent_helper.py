@@ -0,0 +1,59 @@
+import pytest
+
+from app.helpers import intent_helper as intenth
+from app.services import tools_service
+
+
+@pytest.mark.parametrize(
+    "user_input, expected",
+    [
+        ("list my todos", ("get_all_todos", None)),
+        ("Show me all the tasks.", ("get_all_todos", None)),
+        ("what are my todos?", ("get_all_todos", None)),
+        ("delete 3", ("delete_todos_by_id", 3)),
+        ("remove task #12", ("delete_todos_by_id", 12)),
+        ('delete "buy milk"', ("delete_todos_exact", "buy milk")),
+        ("add buy milk", ("create_todos", "buy milk")),
+        ("add milk to my list", ("create_todos", "milk")),
+        ("create todo: file taxes", ("create_todos", "file taxes")),
+        ("create a task to buy eggs", ("create_todos", "buy eggs")),
+        ("add a new task to call mom", ("create_todos", "call mom")),
+        ("new todo: water the plants", ("create_todos", "water the plants")),
+        ("Add task: Tokyo trip", ("create_todos", "Tokyo trip")),
+    ],
+)
+def test_routes_unambiguous_commands(user_input, expected):
+    assert intenth.route_intent(user_input) == expected
+
+
+@pytest.mark.parametrize(
+    "user_input",
+    [
+        "New York trip planning",
+        "new year party",
+        "add to my list",
+        "add task",
+        "add todo 5",
+        "add it again",
+        "add milk and then delete eggs",
+        "delete the milk one",
+        "remind me to finish the quarterly report",
+        "",
+    ],
+)
+def test_leaves_everything_else_to_the_llm(user_input):
+    assert intenth.route_intent(user_input) is None
+
+
+def test_list_message_is_written_for_the_user():
+    message = tools_service._list_message([(2, "call mom"), (1, "buy milk")])
+    assert message == "You have 2 todos:\n- buy milk (ID: 1)\n- call mom (ID: 2)"
+    assert tools_service._list_message([]) == "You have no todos."
+
+
+def test_list_message_shows_the_newest_page_of_long_lists(monkeypatch):
+    monkeypatch.setattr(tools_service.settings, "TODO_PAGE_DEFAULT_SIZE", 2)
+    message = tools_service._list_message([(i, f"task {i}") for i in range(1, 6)])
+    assert message.splitlines()[1:3] == ["- task 4 (ID: 4)", "- task 5 (ID: 5)"]
+    assert "3 older ones" in message
+    assert "search_todos" not in message
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from app.services import job_service
+
+
+def test_in_process_broker_is_refused_with_several_workers(monkeypatch):
+    monkeypatch.setattr(job_service.settings, "JOB_BROKER_URL", None)
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    with pytest.raises(RuntimeError, match="JOB_BROKER_URL"):
+        job_service.create_broker()
+
+
+def test_in_process_broker_serves_a_single_worker(monkeypatch):
+    monkeypatch.setattr(job_service.settings, "JOB_BROKER_URL", None)
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    assert isinstance(job_service.create_broker(), job_service.InProcessBroker)
+
+
+def test_in_process_broker_bounds_the_queue():
+    async def scenario():
+        broker = job_service.InProcessBroker(max_size=1, result_ttl=60)
+        await broker.enqueue(job_service.new_job("add milk", "alice"))
+        with pytest.raises(job_service.QueueFullError):
+            await broker.enqueue(job_service.new_job("add eggs", "alice"))
+        return await broker.depth()
+
+    assert asyncio.run(scenario()) == 1
+
+
+class FlakyBroker(job_service.InProcessBroker):
+    """In-process broker whose save fails for the first failures calls."""
+
+    def __init__(self, failures: int) -> None:
+        super().__init__(max_size=10, result_ttl=60)
+        self.failures = failures
+
+    async def save(self, job):
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("broker unavailable")
+        await super().save(job)
+
+
+def test_worker_survives_a_broker_that_fails_to_save(monkeypatch):
+    async def run_agent(self, job, usage):
+        job["message"] = f"done: {job['user_input']}"
+
+    monkeypatch.setattr(job_service.JobWorkerPool, "_run_agent", run_agent)
+
+    async def scenario():
+        broker = FlakyBroker(failures=1)
+        pool = job_service.JobWorkerPool(broker, workers=1)
+        pool.start()
+        first = job_service.new_job("add milk", "alice")
+        second = job_service.new_job("add eggs", "alice")
+        await broker.enqueue(first)
+        await broker.enqueue(second)
+        for _ in range(100):
+            job = await broker.get(second["id"])
+            if job["status"] == job_service.SUCCEEDED:
+                break
+            await asyncio.sleep(0.01)
+        await pool.stop()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job["message"] == "done: add eggs"
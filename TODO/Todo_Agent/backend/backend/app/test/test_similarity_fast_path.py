@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from app.helpers import intent_helper as intenth
+from app.models.todo import Todos
+from app.services import tools_service
+
+
+TODOS = ["Finish the quarterly report", "Dentist appointment", "Buy milk", "Call grandma"]
+
+
+@pytest.fixture(autouse=True)
+def direct_delete(monkeypatch):
+    """Direct deletes enabled on a single worker with local versions."""
+    monkeypatch.setattr(tools_service.settings, "SIMILARITY_DIRECT_DELETE", True)
+    monkeypatch.setattr(tools_service.settings, "LLM_CACHE_REDIS_URL", None)
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+
+
+def _ask(session_factory, user_id, user_input):
+    async def scenario():
+        async with session_factory() as db:
+            await Todos.bulk_create_todos(db, user_id, TODOS)
+            message = await tools_service.process_todo_request(user_input, db, user_id)
+            remaining = [todo.todo_task for todo in await Todos.get_all_todos(db, user_id)]
+            return message, remaining
+
+    return asyncio.run(scenario())
+
+
+@pytest.mark.parametrize(
+    "user_input",
+    ["Remind me to finish the quarterly report", "Did I add the dentist appointment?"],
+)
+def test_requests_that_only_mention_a_todo_never_delete_it(session_factory, user_id, provider, user_input):
+    message, remaining = _ask(session_factory, user_id, user_input)
+
+    assert message == "Answered by the LLM."
+    assert provider.calls == 1
+    assert sorted(remaining) == sorted(TODOS)
+
+
+def test_explicit_delete_command_skips_the_llm(session_factory, user_id, provider):
+    message, remaining = _ask(session_factory, user_id, "delete the dentist thing")
+
+    assert message.startswith("Done! I removed 'Dentist appointment'")
+    assert provider.calls == 0
+    assert "Dentist appointment" not in remaining
+
+
+def test_direct_delete_needs_versions_shared_by_all_workers(session_factory, user_id, provider, monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    message, remaining = _ask(session_factory, user_id, "delete the dentist thing")
+
+    assert message == "Answered by the LLM."
+    assert sorted(remaining) == sorted(TODOS)
+
+
+def test_direct_delete_is_off_by_default(session_factory, user_id, provider, monkeypatch):
+    monkeypatch.setattr(tools_service.settings, "SIMILARITY_DIRECT_DELETE", False)
+    message, remaining = _ask(session_factory, user_id, "delete the dentist thing")
+
+    assert message == "Answered by the LLM."
+    assert sorted(remaining) == sorted(TODOS)
+
+
+@pytest.mark.parametrize(
+    "user_input, reference",
+    [
+        ("delete the dentist thing", "dentist"),
+        ("Cross off the shopping thing.", "shopping"),
+        ("mark the dentist appointment as done", "dentist appointment"),
+        ("mark the dentist appointment", None),
+        ("can you delete the dentist thing?", None),
+        ("Finish the quarterly report", None),
+        ("I finished that shopping thing", None),
+        ("delete all of them", None),
+    ],
+)
+def test_only_imperative_single_todo_commands_are_delete_commands(user_input, reference):
+    assert intenth.extract_delete_command(user_input) == reference
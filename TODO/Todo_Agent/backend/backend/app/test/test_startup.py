@@ -0,0 +1,16 @@
+from pathlib import Path
+
+from test.benchmarks import bench_startup
+
+
+def test_provider_sdks_are_not_imported_with_the_app(tmp_path: Path):
+    modules = bench_startup._import_profile(bench_startup._environment(tmp_path))
+
+    assert any(name == "app.main" for name, _, _, _ in modules)
+    assert bench_startup._eager_modules(modules) == []
+
+
+def test_app_boots_and_answers_with_the_scripted_provider(tmp_path: Path):
+    timings = bench_startup._boot(bench_startup._environment(tmp_path))
+
+    assert set(timings) == set(bench_startup.PHASES)
@@ -0,0 +1,127 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils import swr_cache
+from app.utils.swr_cache import SWRCache
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Loader:
+    """Loads "value-N" on the N-th call, after gate opens; fails while failing is set."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.failing = False
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        call = self.calls
+        await self.gate.wait()
+        if self.failing:
+            raise RuntimeError("upstream down")
+        return f"value-{call}"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # Only the cache's clock; asyncio keeps the real one
+    monkeypatch.setattr(swr_cache, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def test_concurrent_misses_share_one_load(clock):
+    cache = SWRCache(max_entries=8, ttl_seconds=10)
+
+    async def scenario():
+        loader = Loader()
+        loader.gate.clear()
+        waiters = [asyncio.ensure_future(cache.get_or_load("paris", loader)) for _ in range(5)]
+        await asyncio.sleep(0)
+        loader.gate.set()
+        return await asyncio.gather(*waiters), loader.calls
+
+    values, calls = asyncio.run(scenario())
+
+    assert values == ["value-1"] * 5
+    assert calls == 1
+    assert (cache.misses, cache.coalesced) == (1, 4)
+
+
+def test_stale_entry_is_served_while_one_refresh_runs(clock):
+    cache = SWRCache(max_entries=8, ttl_seconds=10, stale_seconds=60)
+
+    async def scenario():
+        loader = Loader()
+        await cache.get_or_load("paris", loader)
+        clock.now += 30
+        loader.gate.clear()
+        stale = [await cache.get_or_load("paris", loader) for _ in range(3)]
+        loader.gate.set()
+        await asyncio.sleep(0.01)
+        return stale, await cache.get_or_load("paris", loader), loader.calls
+
+    stale, refreshed, calls = asyncio.run(scenario())
+
+    assert stale == ["value-1"] * 3
+    assert refreshed == "value-2"
+    assert calls == 2
+    assert (cache.stale_hits, cache.refreshes) == (3, 1)
+
+
+def test_failed_refresh_keeps_the_stale_value_and_is_retried(clock):
+    cache = SWRCache(max_entries=8, ttl_seconds=10, stale_seconds=60)
+
+    async def scenario():
+        loader = Loader()
+        await cache.get_or_load("paris", loader)
+        clock.now += 30
+        loader.failing = True
+        reads = [await cache.get_or_load("paris", loader)]
+        await asyncio.sleep(0.01)
+        loader.failing = False
+        reads.append(await cache.get_or_load("paris", loader))
+        await asyncio.sleep(0.01)
+        reads.append(await cache.get_or_load("paris", loader))
+        return reads
+
+    assert asyncio.run(scenario()) == ["value-1", "value-1", "value-3"]
+    assert (cache.refreshes, cache.refresh_errors) == (2, 1)
+
+
+def test_failed_load_is_not_cached(clock):
+    cache = SWRCache(max_entries=8, ttl_seconds=10)
+
+    async def scenario():
+        loader = Loader()
+        loader.failing = True
+        with pytest.raises(RuntimeError):
+            await cache.get_or_load("paris", loader)
+        loader.failing = False
+        return await cache.get_or_load("paris", loader)
+
+    assert asyncio.run(scenario()) == "value-2"
+
+
+def test_expired_entry_is_loaded_again(clock):
+    cache = SWRCache(max_entries=8, ttl_seconds=10, stale_seconds=5)
+
+    async def scenario():
+        loader = Loader()
+        await cache.get_or_load("paris", loader)
+        clock.now += 20
+        return await cache.get_or_load("paris", loader)
+
+    assert asyncio.run(scenario()) == "value-2"
+    assert cache.misses == 2
@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from app.api import deps
+
+
+TODO_URL = "/api/v1/todo"
+
+
+@pytest.fixture
+def users(client, user_id):
+    """Headers of users A and B, with A owning two todos."""
+    alice, bob = {"X-User-Id": f"{user_id}-a"}, {"X-User-Id": f"{user_id}-b"}
+    created = client.post(f"{TODO_URL}/todos/bulk", json={"tasks": ["Buy milk", "Call mom"]}, headers=alice)
+    assert created.status_code == 200
+    return alice, bob, [row["id"] for row in created.json()["data"]]
+
+
+def _tasks(client, headers):
+    response = client.get(f"{TODO_URL}/todos", headers=headers)
+    assert response.status_code == 200
+    return [item["task"] for item in response.json()["data"]["items"]]
+
+
+def _finished_job(client, job_id, headers):
+    for _ in range(100):
+        job = client.get(f"{TODO_URL}/jobs/{job_id}", headers=headers).json()["data"]
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_request_without_user_is_refused(client):
+    assert deps.settings.DEFAULT_USER_ID is None
+    assert client.get(f"{TODO_URL}/todos").status_code == 401
+
+
+def test_user_cannot_list_another_users_todos(client, users):
+    alice, bob, _ = users
+
+    assert _tasks(client, bob) == []
+    assert _tasks(client, alice) == ["Buy milk", "Call mom"]
+
+
+def test_user_cannot_delete_another_users_todos(client, users):
+    alice, bob, ids = users
+    response = client.request("DELETE", f"{TODO_URL}/todos/bulk", json={"ids": ids}, headers=bob)
+
+    assert [row["deleted"] for row in response.json()["data"]] == [False, False]
+    assert _tasks(client, alice) == ["Buy milk", "Call mom"]
+
+
+def test_agent_only_sees_the_callers_todos(client, users):
+    alice, bob, ids = users
+    job = client.post(f"{TODO_URL}/jobs", json={"user_input": f"delete todo {ids[0]}"}, headers=bob)
+
+    job = _finished_job(client, job.json()["data"]["id"], bob)
+
+    assert job["message"] == f"Todo with ID {ids[0]} not found - nothing was deleted"
+    assert _tasks(client, alice) == ["Buy milk", "Call mom"]
+
+
+def test_user_cannot_export_another_users_todos(client, users):
+    alice, bob, _ = users
+
+    assert client.get(f"{TODO_URL}/todos/export", headers=bob).text == ""
+    assert "Buy milk" in client.get(f"{TODO_URL}/todos/export", headers=alice).text
+
+
+def test_user_cannot_poll_another_users_job(client, users):
+    alice, bob, _ = users
+    job = client.post(f"{TODO_URL}/jobs", json={"user_input": "list my todos"}, headers=alice)
+    job_id = job.json()["data"]["id"]
+
+    assert client.get(f"{TODO_URL}/jobs/{job_id}", headers=bob).status_code == 404
+    assert client.get(f"{TODO_URL}/jobs/{job_id}/events", headers=bob).status_code == 404
+    assert "Buy milk" in _finished_job(client, job_id, alice)["message"]
@@ -0,0 +1,64 @@
+from datetime import datetime
+
+import pytest
+
+from app.utils.cursor import decode_cursor, encode_cursor
+
+
+TODOS_URL = "/api/v1/todo/todos"
+
+
+def _pages(client, headers, size):
+    pages, cursor = [], None
+    while True:
+        params = {"size": size, **({"cursor": cursor} if cursor else {})}
+        response = client.get(TODOS_URL, params=params, headers=headers)
+        assert response.status_code == 200
+        page = response.json()["data"]
+        pages.append([item["task"] for item in page["items"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 1, 2, 3, 4, 5, 678901)
+
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor(datetime(2026, 1, 1), 1)[:-3]])
+def test_foreign_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_pages_cover_every_todo_once_in_order(client, user_id):
+    headers = {"X-User-Id": user_id}
+    tasks = [f"Todo {i}" for i in range(7)]
+    # One bulk insert gives every row the same created_at, so only the id breaks ties
+    assert client.post(f"{TODOS_URL}/bulk", json={"tasks": tasks}, headers=headers).status_code == 200
+
+    assert _pages(client, headers, 3) == [tasks[0:3], tasks[3:6], tasks[6:7]]
+    assert _pages(client, headers, 7) == [tasks]
+
+
+def test_page_after_a_deleted_cursor_row_continues(client, user_id):
+    headers = {"X-User-Id": user_id}
+    tasks = [f"Todo {i}" for i in range(4)]
+    created = client.post(f"{TODOS_URL}/bulk", json={"tasks": tasks}, headers=headers)
+    ids = [row["id"] for row in created.json()["data"]]
+    first = client.get(TODOS_URL, params={"size": 2}, headers=headers).json()["data"]
+
+    client.request("DELETE", f"{TODOS_URL}/bulk", json={"ids": ids[1:2]}, headers=headers)
+    params = {"size": 2, "cursor": first["next_cursor"]}
+    second = client.get(TODOS_URL, params=params, headers=headers).json()["data"]
+
+    assert [item["task"] for item in second["items"]] == tasks[2:4]
+    assert second["next_cursor"] is None
+
+
+def test_invalid_cursor_is_a_bad_request(client, user_id):
+    response = client.get(TODOS_URL, params={"cursor": "not-a-cursor"}, headers={"X-User-Id": user_id})
+
+    assert response.status_code == 400
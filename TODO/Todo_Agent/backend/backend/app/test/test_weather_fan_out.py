@@ -0,0 +1,110 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.api.v1.endpoints import weather
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """City -> seconds the fake upstream takes; an exception instance fails that city."""
+    delays: dict = {}
+
+    async def fake_get_weather_async(city, client):
+        delay = delays.get(city, 0)
+        if isinstance(delay, Exception):
+            raise delay
+        await asyncio.sleep(delay)
+        return {"city": city}
+
+    monkeypatch.setattr(weather, "get_weather_async", fake_get_weather_async)
+    monkeypatch.setattr(weather.settings, "WEATHER_FANOUT_CONCURRENCY", 10)
+    monkeypatch.setattr(weather.settings, "WEATHER_CITY_TIMEOUT_SECONDS", 5)
+    monkeypatch.setattr(weather.settings, "WEATHER_FANOUT_DEADLINE_SECONDS", 5)
+    return delays
+
+
+def fan_out(cities):
+    async def run():
+        return [result async for result in weather._fan_out(cities, client=None)]
+
+    return asyncio.run(run())
+
+
+def test_results_arrive_in_completion_order(upstream):
+    upstream.update({"Quito": 0.05, "Miami": 0})
+
+    results = fan_out(["Quito", "Miami"])
+
+    assert [(r["index"], r["city"]) for r in results] == [(1, "Miami"), (0, "Quito")]
+    assert all("weather" in r for r in results)
+
+
+def test_slow_city_times_out_without_failing_the_others(upstream, monkeypatch):
+    monkeypatch.setattr(weather.settings, "WEATHER_CITY_TIMEOUT_SECONDS", 0.05)
+    upstream.update({"Quito": 1})
+
+    results = {r["city"]: r for r in fan_out(["Quito", "Miami"])}
+
+    assert results["Quito"]["error"] == "timed out"
+    assert results["Miami"]["weather"] == {"city": "Miami"}
+
+
+def test_deadline_returns_partial_results(upstream, monkeypatch):
+    monkeypatch.setattr(weather.settings, "WEATHER_FANOUT_DEADLINE_SECONDS", 0.1)
+    upstream.update({"Quito": 0, "Miami": 1, "Barcelona": 1})
+
+    start = time.monotonic()
+    results = fan_out(["Quito", "Miami", "Barcelona"])
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 0.5
+    assert [r["city"] for r in results if "weather" in r] == ["Quito"]
+    assert sorted(r["city"] for r in results if r.get("error") == "timed out") == ["Barcelona", "Miami"]
+
+
+def test_queued_cities_share_the_deadline(upstream, monkeypatch):
+    # With one slot, the second city waits behind the first and runs out of time
+    monkeypatch.setattr(weather.settings, "WEATHER_FANOUT_CONCURRENCY", 1)
+    monkeypatch.setattr(weather.settings, "WEATHER_FANOUT_DEADLINE_SECONDS", 0.1)
+    upstream.update({"Quito": 0.08, "Miami": 0.08})
+
+    results = {r["city"]: r for r in fan_out(["Quito", "Miami"])}
+
+    assert "weather" in results["Quito"]
+    assert results["Miami"]["error"] == "timed out"
+
+
+def test_upstream_errors_are_reported_per_city(upstream):
+    upstream.update({"Quito": RuntimeError("503 Service Unavailable\nbody")})
+
+    results = {r["city"]: r for r in fan_out(["Quito", "Miami"])}
+
+    assert results["Quito"]["error"] == "503 Service Unavailable"
+    assert "weather" in results["Miami"]
+
+
+def test_sse_stream_ends_with_a_summary(upstream, monkeypatch):
+    monkeypatch.setattr(weather.settings, "WEATHER_CITY_TIMEOUT_SECONDS", 0.05)
+    upstream.update({"Quito": 1})
+
+    async def run():
+        return [chunk async for chunk in weather._stream_fan_out(["Quito", "Miami"], None, "sse")]
+
+    chunks = asyncio.run(run())
+
+    assert [chunk.split("\n")[0] for chunk in chunks] == ["event: weather", "event: error", "event: done"]
+    assert json.loads(chunks[-1].split("data: ")[1]) == {"cities": 2, "errors": 1}
+
+
+def test_ndjson_stream_has_one_line_per_city(upstream):
+    async def run():
+        return [chunk async for chunk in weather._stream_fan_out(["Quito", "Miami"], None, "ndjson")]
+
+    lines = asyncio.run(run())
+
+    assert sorted(json.loads(line)["city"] for line in lines) == ["Miami", "Quito"]
+    assert all(line.endswith("\n") for line in lines)
+